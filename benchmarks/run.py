@@ -0,0 +1,679 @@
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), "src")
+FORMAT_VERSION = 1
+REMOTE_HOST = "bench"
+REPOSITORY_NAME = "bench"
+EXCLUDED_DIR_NAMES = [".git", "__pycache__", "build"]
+SSH_CONNECTION_KINDS = ["master", "reused", "direct"]
+SCENARIO_GROUPS = [
+    "commands",
+    "exclude-scan",
+    "exclude-mode",
+    "transfer-profile",
+    "snapshots",
+    "remote",
+]
+EXCLUDE_MODES = ["expand", "native"]
+TRANSFER_PROFILES = {"compress": {"compress": True}, "auto": "auto"}
+PACK_SIZE = 4 * 1024 * 1024
+REMOTE_TIMEOUT = 10
+# Each fake host runs a real backup through the uploaded zipapp; "slow" blocks
+# on its password command until remote-timeout kills it, "broken" has no
+# repository and may not create one.
+REMOTE_HOSTS = {"bench-ok": "OK", "bench-slow": "TIMEOUT", "bench-broken": "FAILED"}
+
+
+@dataclass
+class TreeShape:
+    dirs: int
+    files_per_dir: int
+    file_size: int
+    depth: int
+    excluded_dir_ratio: float = 0.1
+    changed_file_ratio: float = 0.05
+
+
+PRESETS = {
+    "small": TreeShape(dirs=20, files_per_dir=25, file_size=4 * 1024, depth=2),
+    "medium": TreeShape(dirs=200, files_per_dir=50, file_size=16 * 1024, depth=3),
+    "large": TreeShape(dirs=1000, files_per_dir=100, file_size=64 * 1024, depth=4),
+    "million": TreeShape(dirs=10000, files_per_dir=100, file_size=0, depth=4),
+}
+
+
+def generate_tree(root: str, shape: TreeShape, rng: random.Random) -> list[str]:
+    file_paths = []
+    for index in range(shape.dirs):
+        parts = [f"d{rng.randrange(shape.dirs)}" for _ in range(shape.depth - 1)]
+        dir_path = os.path.join(root, *parts, f"d{index}")
+        if rng.random() < shape.excluded_dir_ratio:
+            dir_path = os.path.join(dir_path, rng.choice(EXCLUDED_DIR_NAMES))
+        os.makedirs(dir_path, exist_ok=True)
+        for file_index in range(shape.files_per_dir):
+            size = rng.randint(shape.file_size // 2, shape.file_size * 3 // 2)
+            file_path = os.path.join(dir_path, f"f{file_index}.bin")
+            with open(file_path, "wb") as f:
+                f.write(rng.randbytes(size))
+            file_paths.append(file_path)
+    return file_paths
+
+
+def generate_repository(root: str, size: int, rng: random.Random) -> None:
+    # Random bytes stand in for restic packs, which are compressed and
+    # encrypted and so just as incompressible.
+    for dir_name in ["data", "index", "keys", "snapshots"]:
+        os.makedirs(os.path.join(root, dir_name))
+    with open(os.path.join(root, "config"), "wb") as f:
+        f.write(rng.randbytes(256))
+    written = 0
+    while written < size:
+        pack_id = rng.randbytes(32).hex()
+        pack_dir = os.path.join(root, "data", pack_id[:2])
+        os.makedirs(pack_dir, exist_ok=True)
+        pack_size = min(PACK_SIZE, size - written)
+        with open(os.path.join(pack_dir, pack_id), "wb") as f:
+            f.write(rng.randbytes(pack_size))
+        written += pack_size
+
+
+def change_tree(
+    file_paths: list[str], shape: TreeShape, rng: random.Random
+) -> None:
+    count = max(1, int(len(file_paths) * shape.changed_file_ratio))
+    for file_path in rng.sample(file_paths, count):
+        with open(file_path, "r+b") as f:
+            f.write(rng.randbytes(min(4096, shape.file_size)))
+
+
+class BenchmarkRun:
+
+    def __init__(
+        self,
+        work_dir: str,
+        shape: TreeShape,
+        seed: int,
+        ssh_handshake_delay: float = 0.0,
+    ) -> None:
+        self.work_dir = work_dir
+        self.shape = shape
+        self.rng = random.Random(seed)
+        self.tree_path = os.path.join(work_dir, "tree")
+        self.local_path = os.path.join(work_dir, "local")
+        self.remote_path = os.path.join(work_dir, "remote")
+        self.config_path = os.path.join(work_dir, "config.json")
+        self.ssh_log_path = os.path.join(work_dir, "ssh.log")
+        self.hosts_path = os.path.join(work_dir, "hosts")
+        self.last_output = ""
+        home_path = os.path.join(work_dir, "home")
+        self.env = {
+            **os.environ,
+            "HOME": home_path,
+            "XDG_CACHE_HOME": os.path.join(home_path, ".cache"),
+            "XDG_STATE_HOME": os.path.join(home_path, ".local", "state"),
+            "PATH": os.pathsep.join(
+                [os.path.join(BENCHMARK_DIR, "bin"), os.environ["PATH"]]
+            ),
+            "PYTHONPATH": SOURCE_DIR,
+            "BATCHUP_BENCH_SSH_LOG": self.ssh_log_path,
+            "BATCHUP_BENCH_SSH_HANDSHAKE": str(ssh_handshake_delay),
+            "BATCHUP_BENCH_SSH_HOME": self.hosts_path,
+        }
+        os.makedirs(os.path.join(home_path, ".config", "batchup"))
+        os.makedirs(self.remote_path)
+
+    def run(self) -> dict[str, dict]:
+        file_paths = generate_tree(self.tree_path, self.shape, self.rng)
+        self._write_config()
+
+        results = {}
+        results["backup-initial"] = self._run_command("backup")
+        change_tree(file_paths, self.shape, self.rng)
+        results["backup-incremental"] = self._run_command("backup")
+        results["push"] = self._run_command("push")
+        results["push-unchanged"] = self._run_command("push")
+        shutil.copytree(
+            os.path.join(self.local_path, REPOSITORY_NAME),
+            os.path.join(self.remote_path, "other"),
+        )
+        results["pull"] = self._run_command("pull")
+        return results
+
+    def run_exclude_modes(self) -> dict[str, dict]:
+        generate_tree(self.tree_path, self.shape, self.rng)
+        results = {}
+        for mode in EXCLUDE_MODES:
+            # A repository per mode, so both backups start from scratch.
+            self._write_config(
+                {"exclude-mode": mode, "local-backup-name": f"{REPOSITORY_NAME}-{mode}"}
+            )
+            results[f"backup-{mode}"] = self._run_command("backup")
+        return results
+
+    def run_transfer_profiles(self, size: int) -> dict[str, dict]:
+        generate_repository(
+            os.path.join(self.local_path, REPOSITORY_NAME), size, self.rng
+        )
+        results = {}
+        # The compressed push runs first, so "auto" decides with a measured
+        # throughput as it would after the first transfer to a host.
+        for name, profile in TRANSFER_PROFILES.items():
+            remote_path = os.path.join(self.remote_path, name)
+            os.makedirs(remote_path)
+            self._write_config(
+                {
+                    "remote-backup-paths": [f"{REMOTE_HOST}:{remote_path}"],
+                    "transfer-profiles": {"default": profile},
+                }
+            )
+            result = self._run_command("push")
+            result["cpu-seconds-per-gb"] = result["children-cpu-seconds"] / (
+                size / 1e9
+            )
+            results[f"push-{name}"] = result
+        return results
+
+    def run_remote(self) -> dict[str, dict]:
+        pid_path = os.path.join(self.hosts_path, "bench-slow", "password.pid")
+        for host in REMOTE_HOSTS:
+            self._write_host_config(host, pid_path)
+        self._write_config(
+            {
+                "remote-backup-paths": [f"{host}:/backup" for host in REMOTE_HOSTS],
+                "remote-concurrency": len(REMOTE_HOSTS),
+                "remote-timeout": REMOTE_TIMEOUT,
+            }
+        )
+        # A host left running after its timeout would hold the run open.
+        result = self._run_command(
+            "remote", expected_return_code=1, timeout=REMOTE_TIMEOUT * 3
+        )
+
+        output = self.last_output
+        for host, status in REMOTE_HOSTS.items():
+            if not re.search(rf"^{host}\s+{status}\s", output, re.MULTILINE):
+                raise RuntimeError(f"'batchup remote' did not report {host} {status}")
+            if status != "TIMEOUT" and f"[{host}] " not in output:
+                raise RuntimeError(f"'batchup remote' did not relay {host}'s output")
+        with open(pid_path) as f:
+            if is_running(int(f.read())):
+                raise RuntimeError("The timed out remote backup is still running")
+        return {"remote": result}
+
+    def _write_host_config(self, host: str, pid_path: str) -> None:
+        home_path = os.path.join(self.hosts_path, host)
+        config_dir = os.path.join(home_path, ".config", "batchup")
+        tree_path = os.path.join(home_path, "tree")
+        os.makedirs(config_dir)
+        os.makedirs(tree_path)
+        with open(os.path.join(tree_path, "file.txt"), "w") as f:
+            f.write(f"{host}\n")
+        password_path = os.path.join(home_path, "password")
+        with open(password_path, "w") as f:
+            f.write("benchmark\n")
+        os.chmod(password_path, 0o600)
+        config = {
+            "local-backup-path": os.path.join(home_path, "local"),
+            "local-backup-name": REPOSITORY_NAME,
+            "includes": [tree_path],
+            "password": {"file": password_path},
+            "create-repository": "always",
+            "list-snapshots": 0,
+        }
+        if REMOTE_HOSTS[host] == "TIMEOUT":
+            config["password"] = {
+                "command": ["sh", "-c", f"echo $$ > {pid_path}; exec sleep 600"]
+            }
+        elif REMOTE_HOSTS[host] == "FAILED":
+            config["create-repository"] = "never"
+        with open(os.path.join(config_dir, "config.json"), "w") as f:
+            json.dump(config, fp=f, indent=2)
+
+    def _write_config(self, overrides: dict | None = None) -> None:
+        password_path = os.path.join(self.work_dir, "password")
+        with open(password_path, "w") as f:
+            f.write("benchmark\n")
+        os.chmod(password_path, 0o600)
+        config = {
+            "local-backup-path": self.local_path,
+            "local-backup-name": REPOSITORY_NAME,
+            "remote-backup-paths": [f"{REMOTE_HOST}:{self.remote_path}"],
+            "includes": [self.tree_path],
+            "exclude-templates": [f"**/{name}" for name in EXCLUDED_DIR_NAMES],
+            "password": {"file": password_path},
+            "create-repository": "always",
+            "list-snapshots": 0,
+            "probe-cache-ttl": 0,
+            **(overrides or {}),
+        }
+        with open(self.config_path, "w") as f:
+            json.dump(config, fp=f, indent=2)
+
+    def _run_command(
+        self,
+        command: str,
+        expected_return_code: int = 0,
+        timeout: float | None = None,
+    ) -> dict:
+        trace_path = os.path.join(self.work_dir, f"{command}.trace.json")
+        open(self.ssh_log_path, "w").close()
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "batchup.main",
+                    command,
+                    "-c",
+                    self.config_path,
+                    "--profile",
+                    trace_path,
+                ],
+                env=self.env,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            raise RuntimeError(f"'batchup {command}' did not finish in {timeout}s")
+        wall_seconds = time.perf_counter() - start
+        self.last_output = result.stdout + result.stderr
+        if result.returncode != expected_return_code:
+            sys.stderr.write(self.last_output)
+            raise RuntimeError(f"'batchup {command}' exited with {result.returncode}")
+
+        with open(trace_path) as f:
+            events = json.load(fp=f)["traceEvents"]
+        stages: dict[str, float] = {}
+        children_cpu_seconds = 0.0
+        peak_rss_kib = {}
+        for event in events:
+            if event["name"] == command:
+                children_cpu_seconds = event["args"]["children-cpu-seconds"]
+                peak_rss_kib = {
+                    "batchup": event["args"]["peak-rss-kib"],
+                    "largest-child": event["args"]["largest-child-rss-kib"],
+                }
+                continue
+            stages[event["name"]] = stages.get(event["name"], 0.0) + (
+                event["dur"] / 1e6
+            )
+        ssh_connections = dict.fromkeys(SSH_CONNECTION_KINDS, 0)
+        with open(self.ssh_log_path) as f:
+            for line in f:
+                kind = line.split()[0]
+                if kind in ssh_connections:
+                    ssh_connections[kind] += 1
+        return {
+            "wall-seconds": wall_seconds,
+            "children-cpu-seconds": children_cpu_seconds,
+            "peak-rss-kib": peak_rss_kib,
+            "stages": stages,
+            "ssh-connections": ssh_connections,
+        }
+
+
+def glob_exclude_paths(job) -> list[str]:
+    # The glob.glob loop the exclude matcher replaced, one walk per template.
+    matched_excludes = []
+    for include_path in job.includes:
+        for exclude_template in job.exclude_templates:
+            matches = glob.glob(
+                pathname=exclude_template, root_dir=include_path, recursive=True
+            )
+            for match in matches:
+                abs_match = os.path.join(include_path, match)
+                if not any(exclude in abs_match for exclude in job.excludes):
+                    matched_excludes.append(abs_match)
+    return job.excludes + matched_excludes
+
+
+def is_running(pid: int) -> bool:
+    # A killed process whose parent is gone may linger as a zombie.
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def run_exclude_scan(shape: TreeShape, seed: int, work_dir: str) -> dict:
+    sys.path.insert(0, SOURCE_DIR)
+    os.environ["XDG_CACHE_HOME"] = os.path.join(work_dir, "cache")
+    from batchup.config import BackupJob
+
+    tree_path = os.path.join(work_dir, "tree")
+    generate_tree(tree_path, shape, random.Random(seed))
+    job = BackupJob(
+        name=REPOSITORY_NAME,
+        repository_name=REPOSITORY_NAME,
+        includes=[tree_path],
+        excludes=[],
+        exclude_templates=[f"**/{name}" for name in EXCLUDED_DIR_NAMES],
+    )
+    stages = {}
+    start = time.perf_counter()
+    glob_exclude_paths(job)
+    stages["glob-loop"] = time.perf_counter() - start
+    for name, use_index in [("full-scan", False), ("index-cold", True)]:
+        job.use_exclude_index = use_index
+        start = time.perf_counter()
+        job.get_exclude_paths()
+        stages[name] = time.perf_counter() - start
+    # Let the directory mtimes settle so the index is allowed to store them.
+    time.sleep(2.1)
+    job.get_exclude_paths()
+    start = time.perf_counter()
+    job.get_exclude_paths()
+    stages["index-warm"] = time.perf_counter() - start
+    wall_seconds = sum(
+        seconds for stage, seconds in stages.items() if stage != "glob-loop"
+    )
+    return {"wall-seconds": wall_seconds, "stages": stages}
+
+
+def run_snapshot_listing(count: int, work_dir: str) -> dict:
+    sys.path.insert(0, SOURCE_DIR)
+    os.environ["XDG_CACHE_HOME"] = os.path.join(work_dir, "cache")
+    os.environ["XDG_STATE_HOME"] = os.path.join(work_dir, "state")
+    from batchup.backup.restic import Restic
+    from batchup.logger import SimpleLogger
+
+    tree_path = os.path.join(work_dir, "tree")
+    repository_path = os.path.join(work_dir, REPOSITORY_NAME)
+    os.makedirs(tree_path)
+    env = {**os.environ, "RESTIC_PASSWORD": "benchmark"}
+    subprocess.run(
+        ["restic", "init", "--repo", repository_path],
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+    for index in range(count):
+        with open(os.path.join(tree_path, "file"), "w") as f:
+            f.write(str(index))
+        subprocess.run(
+            [
+                "restic",
+                "-r",
+                repository_path,
+                "backup",
+                "--tag",
+                "main",
+                "--host",
+                socket.gethostname(),
+                tree_path,
+            ],
+            env=env,
+            check=True,
+            capture_output=True,
+        )
+
+    restic = Restic(SimpleLogger("WARNING"), create_repository="never")
+    stages = {}
+    # Before, the password check and the listing each ran a full "snapshots".
+    start = time.perf_counter()
+    subprocess.run(
+        ["restic", "-r", repository_path, "snapshots"],
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+    stages["snapshots-full"] = time.perf_counter() - start
+    start = time.perf_counter()
+    if not restic.prepare_repository(repository_path, "benchmark"):
+        raise RuntimeError(f"Could not open the repository at {repository_path}")
+    stages["prepare-repository"] = time.perf_counter() - start
+    start = time.perf_counter()
+    restic._list_snapshots(repository_path, env, 5)
+    stages["list-snapshots"] = time.perf_counter() - start
+    return {
+        "wall-seconds": stages["prepare-repository"] + stages["list-snapshots"],
+        "stages": stages,
+    }
+
+
+def median_results(runs: list[dict[str, dict]]) -> dict[str, dict]:
+    results = {}
+    for scenario in runs[0]:
+        samples = [run[scenario] for run in runs]
+        result = {}
+        for key, value in samples[0].items():
+            if isinstance(value, dict):
+                stages = sorted({stage for sample in samples for stage in sample[key]})
+                result[key] = {
+                    stage: round(
+                        statistics.median(
+                            sample[key].get(stage, 0.0) for sample in samples
+                        ),
+                        4,
+                    )
+                    for stage in stages
+                }
+            else:
+                result[key] = round(
+                    statistics.median(sample[key] for sample in samples), 4
+                )
+        results[scenario] = result
+    return results
+
+
+def compare(
+    baseline: dict, current: dict, threshold: float, noise_floor: float
+) -> list[str]:
+    regressions = []
+    rows = [("Scenario", "Metric", "Baseline", "Current", "Change")]
+    for scenario, result in current["scenarios"].items():
+        base_result = baseline["scenarios"].get(scenario)
+        if base_result is None:
+            continue
+        # startup.py records a single duration per scenario.
+        if not isinstance(result, dict):
+            result = {"wall-seconds": result, "stages": {}}
+            base_result = {"wall-seconds": base_result}
+        metrics = [("wall-seconds", result["wall-seconds"])]
+        metrics += [(stage, value) for stage, value in result["stages"].items()]
+        base_metrics = {"wall-seconds": base_result["wall-seconds"]}
+        base_metrics.update(base_result.get("stages", {}))
+        for metric, value in metrics:
+            base_value = base_metrics.get(metric)
+            if base_value is None:
+                continue
+            change = (value - base_value) / base_value * 100 if base_value else 0.0
+            flag = ""
+            if change > threshold and value - base_value > noise_floor:
+                flag = " !"
+                regressions.append(f"{scenario}/{metric}")
+            rows.append(
+                (
+                    scenario,
+                    metric,
+                    f"{base_value:.4f}s",
+                    f"{value:.4f}s",
+                    f"{change:+.1f}%{flag}",
+                )
+            )
+
+    widths = [max(len(row[index]) for row in rows) for index in range(5)]
+    for row in rows:
+        cells = [cell.ljust(width) for cell, width in zip(row, widths)]
+        print("  ".join(cells).rstrip())
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark batchup end to end against local repositories",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--dirs", type=int, help="Override the preset")
+    parser.add_argument("--files-per-dir", type=int, help="Override the preset")
+    parser.add_argument("--file-size", type=int, help="Override the preset (bytes)")
+    parser.add_argument("--depth", type=int, help="Override the preset")
+    parser.add_argument(
+        "--transfer-size",
+        type=int,
+        default=256,
+        help="MiB pushed by each transfer-profile scenario",
+    )
+    parser.add_argument(
+        "--snapshots",
+        type=int,
+        default=100,
+        help="Snapshots created for the snapshots scenario",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=SCENARIO_GROUPS,
+        default=SCENARIO_GROUPS,
+        help="Only run these scenario groups",
+    )
+    parser.add_argument(
+        "--ssh-handshake-delay",
+        type=float,
+        default=0.0,
+        help="Seconds the fake ssh spends opening each new connection",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against an earlier results file")
+    parser.add_argument(
+        "--threshold", type=float, default=10.0, help="Regression threshold in %%"
+    )
+    parser.add_argument(
+        "--noise-floor",
+        type=float,
+        default=0.05,
+        help="Ignore slowdowns smaller than this many seconds",
+    )
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit with 1 when a metric regressed",
+    )
+    args = parser.parse_args()
+
+    required_commands = []
+    if "commands" in args.scenarios:
+        required_commands += ["restic", "rsync"]
+    if "exclude-mode" in args.scenarios:
+        required_commands += ["restic"]
+    if "transfer-profile" in args.scenarios:
+        required_commands += ["rsync"]
+    if "snapshots" in args.scenarios or "remote" in args.scenarios:
+        required_commands += ["restic"]
+    for command in sorted(set(required_commands)):
+        if not shutil.which(command):
+            print(f"The benchmark requires '{command}' to be installed")
+            exit(1)
+
+    shape = PRESETS[args.preset]
+    overrides = {
+        "dirs": args.dirs,
+        "files_per_dir": args.files_per_dir,
+        "file_size": args.file_size,
+        "depth": args.depth,
+    }
+    shape = TreeShape(
+        **{
+            **asdict(shape),
+            **{key: value for key, value in overrides.items() if value is not None},
+        }
+    )
+
+    runs = []
+    for repeat in range(args.repeat):
+        print(f"Run {repeat + 1}/{args.repeat}...")
+        scenarios = {}
+        if "commands" in args.scenarios:
+            with tempfile.TemporaryDirectory(prefix="batchup-bench-") as work_dir:
+                scenarios.update(
+                    BenchmarkRun(
+                        work_dir, shape, args.seed, args.ssh_handshake_delay
+                    ).run()
+                )
+        if "exclude-scan" in args.scenarios:
+            with tempfile.TemporaryDirectory(prefix="batchup-bench-") as work_dir:
+                scenarios["exclude-scan"] = run_exclude_scan(
+                    shape, args.seed, work_dir
+                )
+        if "exclude-mode" in args.scenarios:
+            with tempfile.TemporaryDirectory(prefix="batchup-bench-") as work_dir:
+                scenarios.update(
+                    BenchmarkRun(
+                        work_dir, shape, args.seed, args.ssh_handshake_delay
+                    ).run_exclude_modes()
+                )
+        if "transfer-profile" in args.scenarios:
+            with tempfile.TemporaryDirectory(prefix="batchup-bench-") as work_dir:
+                scenarios.update(
+                    BenchmarkRun(
+                        work_dir, shape, args.seed, args.ssh_handshake_delay
+                    ).run_transfer_profiles(args.transfer_size * 1024 * 1024)
+                )
+        if "snapshots" in args.scenarios:
+            with tempfile.TemporaryDirectory(prefix="batchup-bench-") as work_dir:
+                scenarios["snapshots"] = run_snapshot_listing(args.snapshots, work_dir)
+        if "remote" in args.scenarios:
+            with tempfile.TemporaryDirectory(prefix="batchup-bench-") as work_dir:
+                scenarios.update(
+                    BenchmarkRun(
+                        work_dir, shape, args.seed, args.ssh_handshake_delay
+                    ).run_remote()
+                )
+        runs.append(scenarios)
+
+    results = {
+        "format": FORMAT_VERSION,
+        "parameters": {
+            **asdict(shape),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "scenarios": sorted(args.scenarios),
+            "snapshots": args.snapshots,
+            "transfer-size": args.transfer_size,
+            "ssh-handshake-delay": args.ssh_handshake_delay,
+        },
+        "scenarios": median_results(runs),
+    }
+    output = json.dumps(results, indent=2, sort_keys=True) + "\n"
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output, end="")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(fp=f)
+        tree_parameters = {**results["parameters"], "repeat": None}
+        if {**baseline.get("parameters", {}), "repeat": None} != tree_parameters:
+            print("Warning: baseline was recorded with different parameters")
+        regressions = compare(baseline, results, args.threshold, args.noise_floor)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}")
+            if args.fail_on_regression:
+                exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from run import compare
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), "src")
+FORMAT_VERSION = 1
+SCENARIOS = {
+    "interpreter": ["-c", "pass"],
+    "help": ["-m", "batchup.main", "--help"],
+    "status": ["-m", "batchup.main", "status"],
+}
+
+
+def make_env(home_path: str) -> dict[str, str]:
+    return {
+        **os.environ,
+        "HOME": home_path,
+        "XDG_CACHE_HOME": os.path.join(home_path, ".cache"),
+        "XDG_STATE_HOME": os.path.join(home_path, ".local", "state"),
+        "PYTHONPATH": SOURCE_DIR,
+    }
+
+
+def time_command(args: list[str], env: dict[str, str], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, *args],
+            env=env,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+        )
+        samples.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            sys.stderr.write(result.stdout.decode() + result.stderr.decode())
+            raise RuntimeError(f"'{' '.join(args)}' exited with {result.returncode}")
+    return statistics.median(samples)
+
+
+def import_times(args: list[str], env: dict[str, str], top: int) -> dict[str, float]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        env=env,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+    )
+    # "import time: self [us] | cumulative | imported package", one per module.
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        if name.startswith("batchup"):
+            modules[name] = int(fields[1]) / 1e6
+    largest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {name: round(seconds, 4) for name, seconds in largest}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the import and startup time of the batchup CLI",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument(
+        "--top", type=int, default=10, help="Report the slowest batchup imports"
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against an earlier results file")
+    parser.add_argument(
+        "--threshold", type=float, default=20.0, help="Regression threshold in %%"
+    )
+    parser.add_argument(
+        "--noise-floor",
+        type=float,
+        default=0.01,
+        help="Ignore slowdowns smaller than this many seconds",
+    )
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit with 1 when a scenario regressed",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="batchup-startup-") as home_path:
+        env = make_env(home_path)
+        scenarios = {
+            name: round(time_command(command, env, args.repeat), 4)
+            for name, command in SCENARIOS.items()
+        }
+        imports = import_times(SCENARIOS["help"], env, args.top)
+
+    results = {
+        "format": FORMAT_VERSION,
+        "parameters": {"repeat": args.repeat},
+        "scenarios": scenarios,
+        "imports": imports,
+    }
+    output = json.dumps(results, indent=2, sort_keys=True) + "\n"
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output, end="")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(fp=f)
+        regressions = compare(baseline, results, args.threshold, args.noise_floor)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}")
+            if args.fail_on_regression:
+                exit(1)
+
+
+if __name__ == "__main__":
+    main()
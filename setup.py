@@ -6,6 +6,7 @@ setup(
     packages=find_packages(where="src"),
     package_dir={"": "src"},
     install_requires=[],
+    extras_require={"keyring": ["keyring"]},
     entry_points={
         "console_scripts": [
             "batchup = batchup.main:main",
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import zipapp
+from functools import cached_property
+
+import batchup
+from batchup.utils import Utils
+
+
+class Artifact:
+    ARTIFACT_DIR_NAME = "artifacts"
+    REMOTE_PATH = ".cache/batchup/batchup.pyz"
+
+    def __init__(self) -> None:
+        self.package_path = os.path.dirname(os.path.abspath(batchup.__file__))
+        self.source_files = self._get_source_files()
+        self.digest = self._get_digest()
+        self.path = Utils.get_cache_path(
+            os.path.join(self.ARTIFACT_DIR_NAME, f"batchup-{self.digest[:16]}.pyz")
+        )
+
+    def build(self) -> str:
+        if os.path.isfile(self.path):
+            return self.path
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with tempfile.TemporaryDirectory() as temp_dir_path:
+            for source_file in self.source_files:
+                target_path = os.path.join(temp_dir_path, "batchup", source_file)
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                shutil.copyfile(
+                    os.path.join(self.package_path, source_file), target_path
+                )
+            temp_path = f"{self.path}.tmp"
+            zipapp.create_archive(
+                temp_dir_path,
+                target=temp_path,
+                interpreter="/usr/bin/env python3",
+                main="batchup.main:main",
+            )
+            os.replace(temp_path, self.path)
+        return self.path
+
+    @cached_property
+    def file_digest(self) -> str:
+        digest = hashlib.sha256()
+        with open(self.build(), "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _get_source_files(self) -> list[str]:
+        source_files = []
+        for dir_path, dir_names, file_names in os.walk(self.package_path):
+            dir_names[:] = sorted(name for name in dir_names if name != "__pycache__")
+            for file_name in sorted(file_names):
+                if file_name.endswith(".py"):
+                    path = os.path.join(dir_path, file_name)
+                    source_files.append(os.path.relpath(path, self.package_path))
+        return source_files
+
+    def _get_digest(self) -> str:
+        digest = hashlib.sha256()
+        for source_file in self.source_files:
+            digest.update(source_file.encode() + b"\0")
+            with open(os.path.join(self.package_path, source_file), "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()
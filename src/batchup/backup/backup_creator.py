@@ -1,98 +1,565 @@
 import os
 import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, partial
 
+from batchup.backup.planner import PlannedStep, Planner
+from batchup.backup.repository_discovery import (
+    RepositoryDiscovery,
+    RepositoryInfo,
+)
+from batchup.backup.repository_sync import RepositorySync
 from batchup.backup.restic import Restic
+from batchup.backup.transfer_profile import ThroughputHistory, TransferProfile
+from batchup.backup.transfer_journal import TransferJournal
+from batchup.backup.transfer_scheduler import (
+    Transfer,
+    TransferResult,
+    TransferScheduler,
+)
+from batchup.backup.verify_state import VerifyState
+from batchup.config import BackupJob
+from batchup.host_health import HostHealth
 from batchup.logger import SimpleLogger
+from batchup.metrics import RunMetrics, TransferMetrics
+from batchup.process import Process
+from batchup.ssh import Ssh
 from batchup.utils import Utils
 
 
 class BackupCreator:
-    def __init__(self, logger: SimpleLogger) -> None:
+    def __init__(
+        self,
+        logger: SimpleLogger,
+        host_health: HostHealth | None = None,
+        sync_mode: str = "rsync",
+        transfer_profiles: dict[str, TransferProfile | None] | None = None,
+        metrics: RunMetrics | None = None,
+        transfer_order: str = "largest-first",
+        create_repository: str = "ask",
+        transfer_retries: int = 0,
+        transfer_retry_delay: float = 5.0,
+    ) -> None:
         self.logger = logger
-        self.restic = Restic(logger)
+        self.host_health = host_health
+        self.sync_mode = sync_mode
+        self.transfer_profiles = transfer_profiles or {}
+        self.metrics = metrics or RunMetrics(command="")
+        self.throughput_history = ThroughputHistory()
+        self.restic = Restic(logger, self.metrics, create_repository)
+        self.discovery = RepositoryDiscovery(logger)
+        self.transfer_order = transfer_order
+        self.transfer_retries = transfer_retries
+        self.transfer_retry_delay = transfer_retry_delay
+
+    @cached_property
+    def planner(self) -> Planner:
+        return Planner(self.logger, self.throughput_history)
 
     def backup_local(
         self,
         local_backup_path: str,
-        local_backup_name: str,
-        include_file_path: str,
-        exclude_file_path: str,
+        jobs: list[tuple[BackupJob, str, str]],
         password: str,
+        max_backup_jobs: int = 1,
+        list_snapshots: int = 0,
+        plan: bool = False,
     ) -> None:
-        if not os.path.exists(include_file_path):
-            self.logger.error(f"File does not exist '{include_file_path}'")
-            return
-        if not os.path.exists(exclude_file_path):
-            self.logger.error(f"File does not exist '{include_file_path}'")
+        for _, include_file_path, exclude_file_path in jobs:
+            for file_path in (include_file_path, exclude_file_path):
+                if not os.path.exists(file_path):
+                    self.logger.error(f"File does not exist '{file_path}'")
+                    return
+
+        if plan:
+            self._plan_backup(local_backup_path, jobs, password, max_backup_jobs)
             return
 
         self._check_repository_directory(local_backup_path)
-        backup_target_path = os.path.join(local_backup_path, local_backup_name)
-        if not self.restic.backup_repository(
-            backup_target_path=backup_target_path,
-            include_file_path=include_file_path,
-            exclude_file_path=exclude_file_path,
-            password=password,
+        # Repository creation may prompt, so prepare every target up front.
+        for job, _, _ in jobs:
+            backup_target_path = os.path.join(local_backup_path, job.repository_name)
+            if not self.restic.prepare_repository(backup_target_path, password):
+                self.logger.error("Failed to create restic backup. Aborting.")
+                exit(1)
+
+        capture_output = max_backup_jobs > 1 and len(jobs) > 1
+        with ThreadPoolExecutor(max_workers=max(1, max_backup_jobs)) as executor:
+            results = executor.map(
+                lambda job_files: self.restic.backup_repository(
+                    backup_target_path=os.path.join(
+                        local_backup_path, job_files[0].repository_name
+                    ),
+                    include_file_path=job_files[1],
+                    exclude_file_path=job_files[2],
+                    password=password,
+                    read_concurrency=job_files[0].read_concurrency,
+                    pack_size=job_files[0].pack_size,
+                    capture_output=capture_output,
+                    list_snapshots=list_snapshots,
+                    retention=job_files[0].retention,
+                    prune_policy=job_files[0].prune_policy,
+                ),
+                jobs,
+            )
+            failed_jobs = [
+                job.name for (job, _, _), success in zip(jobs, results) if not success
+            ]
+
+        if failed_jobs:
+            self.logger.error(
+                f"Failed to create restic backup for jobs: {failed_jobs}. Aborting."
+            )
+            exit(1)
+
+    def verify_local(
+        self,
+        local_backup_path: str,
+        password: str,
+        slices: int = 1,
+        max_verify_jobs: int = 1,
+    ) -> None:
+        repository_paths = []
+        if os.path.isdir(local_backup_path):
+            repository_paths = [
+                os.path.join(local_backup_path, name)
+                for name in sorted(os.listdir(local_backup_path))
+                if os.path.isfile(os.path.join(local_backup_path, name, "config"))
+            ]
+        if not repository_paths:
+            self.logger.info("No local repositories, skipping verify.")
+            return
+
+        verify_state = VerifyState()
+        slices = max(1, slices)
+
+        def verify(repository_path: str) -> tuple[str, bool, float]:
+            data_slice = verify_state.next_slice(repository_path, slices)
+            self.logger.info(
+                f"Checking {repository_path} (data slice {data_slice}/{slices})"
+            )
+            start = time.monotonic()
+            success = self.restic.check_repository(
+                repository_path, password, f"{data_slice}/{slices}"
+            )
+            verify_state.record_check(repository_path, data_slice, slices, success)
+            return f"{data_slice}/{slices}", success, time.monotonic() - start
+
+        with ThreadPoolExecutor(max_workers=max(1, max_verify_jobs)) as executor:
+            results = list(executor.map(verify, repository_paths))
+
+        self.logger.info("Verify summary:")
+        width = max(len(path) for path in repository_paths)
+        for repository_path, (data_slice, success, duration) in zip(
+            repository_paths, results
         ):
-            self.logger.error("Failed to create restic backup. Aborting.")
+            self.logger.write(
+                f"{repository_path:<{width}}  {data_slice:<7}  "
+                f"{'OK' if success else 'FAILED':<6}  {duration:.1f}s"
+            )
+        failed = [
+            path
+            for path, (_, success, _) in zip(repository_paths, results)
+            if not success
+        ]
+        if failed:
+            self.logger.error(f"Verification failed for repositories: {failed}")
+            exit(1)
+
+    def replicate_local(
+        self,
+        local_backup_path: str,
+        repository_names: list[str],
+        remote_backup_paths: list[str],
+        max_transfers: int = 1,
+        max_transfers_per_host: int = 1,
+        plan: bool = False,
+    ) -> None:
+        if len(remote_backup_paths) == 0:
+            self.logger.info("No remote repositories, skipping replication.")
+            return
+
+        self.logger.info(f"Replicating {repository_names} to remote repositories...")
+        transfers: list[Transfer] = []
+        for remote_backup_path in self._get_reachable_paths(remote_backup_paths):
+            for repository_name in repository_names:
+                transfers.append(
+                    Transfer(
+                        os.path.join(local_backup_path, repository_name),
+                        os.path.join(remote_backup_path, repository_name),
+                    )
+                )
+
+        if plan:
+            self._plan_transfers(
+                "Replication plan", transfers, max_transfers, max_transfers_per_host
+            )
+            return
+        self._run_transfers(transfers, max_transfers, max_transfers_per_host)
+
+    def watch_local(
+        self,
+        local_backup_path: str,
+        jobs: list[BackupJob],
+        password: str,
+        debounce: float,
+        min_interval: float,
+    ) -> None:
+        # inotify is loaded through ctypes, which only the watch command needs.
+        from batchup.watcher import Watcher
+
+        self._check_repository_directory(local_backup_path)
+        for job in jobs:
+            backup_target_path = os.path.join(local_backup_path, job.repository_name)
+            if not self.restic.prepare_repository(backup_target_path, password):
+                self.logger.error("Failed to create restic backup. Aborting.")
+                exit(1)
+
+        watcher = Watcher(
+            logger=self.logger,
+            jobs=jobs,
+            run_backup=lambda job, paths: self._backup_paths(
+                local_backup_path, job, paths, password
+            ),
+            debounce=debounce,
+            min_interval=min_interval,
+        )
+        watcher.run()
+
+    def _backup_paths(
+        self, local_backup_path: str, job: BackupJob, paths: list[str], password: str
+    ) -> bool:
+        with tempfile.TemporaryDirectory() as temp_dir_path:
+            include_file_path = os.path.join(temp_dir_path, "include.txt")
+            exclude_file_path = os.path.join(temp_dir_path, "exclude.txt")
+            with open(include_file_path, "w") as f:
+                for path in paths:
+                    f.write(path + "\n")
+            # Native patterns avoid rescanning the include roots on every change.
+            with open(exclude_file_path, "w") as f:
+                for line in job.get_exclude_patterns():
+                    f.write(line + "\n")
+            return self.restic.backup_repository(
+                backup_target_path=os.path.join(
+                    local_backup_path, job.repository_name
+                ),
+                include_file_path=include_file_path,
+                exclude_file_path=exclude_file_path,
+                password=password,
+                read_concurrency=job.read_concurrency,
+                pack_size=job.pack_size,
+                retention=job.retention,
+                tag="watch",
+            )
+
+    def prune_local(
+        self,
+        local_backup_path: str,
+        jobs: list[BackupJob],
+        password: str,
+        force: bool = False,
+    ) -> None:
+        failed_jobs = []
+        for job in jobs:
+            backup_target_path = os.path.join(local_backup_path, job.repository_name)
+            if not os.path.isfile(os.path.join(backup_target_path, "config")):
+                self.logger.warning(f"No repo detected at: {backup_target_path}")
+                continue
+            if not self.restic.prepare_repository(backup_target_path, password):
+                failed_jobs.append(job.name)
+                continue
+            if not self.restic.prune_repository(
+                backup_target_path=backup_target_path,
+                password=password,
+                retention=job.retention,
+                prune_policy=job.prune_policy,
+                force=force,
+            ):
+                failed_jobs.append(job.name)
+
+        if failed_jobs:
+            self.logger.error(f"Failed to prune repositories for jobs: {failed_jobs}")
             exit(1)
 
     def pull_remote_repositories(
         self,
         local_backup_path: str,
-        local_backup_name: str,
+        local_repository_names: set[str],
         remote_backup_paths: list[str],
+        max_transfers: int = 1,
+        max_transfers_per_host: int = 1,
+        resume: bool = False,
+        plan: bool = False,
     ) -> None:
         if len(remote_backup_paths) == 0:
             self.logger.info("No remote repositories, skipping pull.")
             return
 
-        self._check_repository_directory(local_backup_path)
+        journal = TransferJournal("pull")
+        if not plan:
+            self._check_repository_directory(local_backup_path)
+            if resume and self._resume_transfers(
+                journal, max_transfers, max_transfers_per_host
+            ):
+                return
+
         self.logger.info(msg="Pulling remote repositories to local repository...")
-        for external_backup_path in remote_backup_paths:
-            if not Utils.has_server_connection(external_backup_path):
-                self.logger.error(
-                    f"Could not establish connection to: '{external_backup_path}'"
-                )
+        reachable_paths = self._get_reachable_paths(remote_backup_paths)
+        discovered = self.discovery.discover([local_backup_path] + reachable_paths)
+        local_repositories = discovered[local_backup_path] or {}
+        transfers: list[tuple[Transfer, RepositoryInfo, RepositoryInfo | None]] = []
+        for external_backup_path in reachable_paths:
+            external_repositories = discovered[external_backup_path]
+            if external_repositories is None:
                 continue
-
-            external_repo_names = self._get_remote_repository_names(
-                external_backup_path
-            )
-            if local_backup_name in external_repo_names:
-                external_repo_names.remove(local_backup_name)
+            for repository_name in local_repository_names:
+                external_repositories.pop(repository_name, None)
             self.logger.info(
-                f"> Pulling from {external_backup_path} -> {external_repo_names}"
+                f"> Pulling from {external_backup_path} -> "
+                f"{sorted(external_repositories)}"
             )
 
-            for external_repo_name in external_repo_names:
-                from_path = os.path.join(external_backup_path, external_repo_name)
+            for external_repo_name, repository in external_repositories.items():
+                from_path = repository.path
                 destination_path = os.path.join(local_backup_path, external_repo_name)
                 self.logger.info(f"-> Pulling from {from_path} to {destination_path}")
-                self._copy(from_path, destination_path)
+                transfers.append(
+                    (
+                        Transfer(from_path, destination_path),
+                        repository,
+                        local_repositories.get(external_repo_name),
+                    )
+                )
+
+        ordered_transfers = self._order_transfers(transfers)
+        if plan:
+            self._plan_transfers(
+                "Transfer plan",
+                ordered_transfers,
+                max_transfers,
+                max_transfers_per_host,
+            )
+            return
+        journal.begin(ordered_transfers)
+        self._run_transfers(
+            ordered_transfers, max_transfers, max_transfers_per_host, journal
+        )
 
     def push_local_repositories(
-        self, local_backup_path: str, remote_backup_paths: list[str]
+        self,
+        local_backup_path: str,
+        remote_backup_paths: list[str],
+        max_transfers: int = 1,
+        max_transfers_per_host: int = 1,
+        resume: bool = False,
+        plan: bool = False,
     ) -> None:
         if len(remote_backup_paths) == 0:
             self.logger.info("No remote repositories, skipping push.")
             return
 
-        self._check_repository_directory(local_backup_path)
+        journal = TransferJournal("push")
+        if not plan:
+            self._check_repository_directory(local_backup_path)
+            if resume and self._resume_transfers(
+                journal, max_transfers, max_transfers_per_host
+            ):
+                return
+
         self.logger.info("> Pushing local repos to remote repos...")
+        reachable_paths = self._get_reachable_paths(remote_backup_paths)
+        discovered = self.discovery.discover([local_backup_path] + reachable_paths)
+        local_repositories = discovered[local_backup_path] or {}
+        transfers: list[tuple[Transfer, RepositoryInfo, RepositoryInfo | None]] = []
+        for remote_backup_path in reachable_paths:
+            remote_repositories = discovered[remote_backup_path]
+            if remote_repositories is None:
+                continue
+            for local_repo_name, repository in local_repositories.items():
+                from_path = repository.path
+                destination_path = os.path.join(remote_backup_path, local_repo_name)
+                self.logger.info(f"-> Pushing from {from_path} to {destination_path}")
+                transfers.append(
+                    (
+                        Transfer(from_path, destination_path),
+                        repository,
+                        remote_repositories.get(local_repo_name),
+                    )
+                )
+
+        ordered_transfers = self._order_transfers(transfers)
+        if plan:
+            self._plan_transfers(
+                "Transfer plan",
+                ordered_transfers,
+                max_transfers,
+                max_transfers_per_host,
+            )
+            return
+        journal.begin(ordered_transfers)
+        self._run_transfers(
+            ordered_transfers, max_transfers, max_transfers_per_host, journal
+        )
+
+    def _get_reachable_paths(self, remote_backup_paths: list[str]) -> list[str]:
+        reachable_paths = []
         for remote_backup_path in remote_backup_paths:
-            if not Utils.has_server_connection(remote_backup_path):
+            if not self._has_server_connection(remote_backup_path):
                 self.logger.error(
                     f"Could not establish connection to: '{remote_backup_path}'"
                 )
                 continue
+            reachable_paths.append(remote_backup_path)
+        return reachable_paths
 
-            local_repo_names = self._get_local_repository_names(local_backup_path)
-            for local_repo_name in local_repo_names:
-                from_path = os.path.join(local_backup_path, local_repo_name)
-                destination_path = os.path.join(remote_backup_path, local_repo_name)
-                self.logger.info(f"-> Pushing from {from_path} to {destination_path}")
-                self._copy(from_path, destination_path)
+    def _plan_backup(
+        self,
+        local_backup_path: str,
+        jobs: list[tuple[BackupJob, str, str]],
+        password: str,
+        max_backup_jobs: int,
+    ) -> None:
+        def estimate(job_files: tuple[BackupJob, str, str]) -> PlannedStep:
+            job, include_file_path, exclude_file_path = job_files
+            backup_target_path = os.path.join(local_backup_path, job.repository_name)
+            step = PlannedStep(job.name, backup_target_path, backup_target_path)
+            # A dry run needs an existing repository, so a new one is not sized.
+            if not os.path.isfile(os.path.join(backup_target_path, "config")):
+                step.note = "new repository"
+                return step
+            backup_metrics = self.restic.estimate_backup(
+                backup_target_path, include_file_path, exclude_file_path, password
+            )
+            if backup_metrics is None:
+                step.note = "dry run failed"
+                return step
+            step.bytes = backup_metrics.data_added
+            step.files = backup_metrics.files_new + backup_metrics.files_changed
+            step.duration = self.planner.backup_duration(
+                backup_target_path, backup_metrics.total_bytes_processed
+            )
+            return step
+
+        with ThreadPoolExecutor(max_workers=max(1, max_backup_jobs)) as executor:
+            steps = list(executor.map(estimate, jobs))
+        self.planner.print_plan("Backup plan", steps, max_backup_jobs)
+
+    def _plan_transfers(
+        self,
+        title: str,
+        transfers: list[Transfer],
+        max_transfers: int,
+        max_transfers_per_host: int,
+    ) -> None:
+        with ThreadPoolExecutor(max_workers=max(1, max_transfers)) as executor:
+            steps = list(executor.map(self._estimate_transfer, transfers))
+        self.planner.print_plan(title, steps, max_transfers, max_transfers_per_host)
+
+    def _estimate_transfer(self, transfer: Transfer) -> PlannedStep:
+        from_path = transfer.from_path
+        destination_path = transfer.destination_path
+        rsync_args = self._get_rsync_args(from_path, destination_path)
+        step = PlannedStep(from_path, destination_path, transfer.host)
+        try:
+            if self.sync_mode == "manifest":
+                try:
+                    # Only diffed here, so rsync is never run.
+                    missing, stale = RepositorySync(
+                        self.logger, rsync_args, lambda cmd: ""
+                    ).diff(from_path, destination_path)
+                    step.bytes = sum(missing.values())
+                    step.files = len(missing)
+                    if stale:
+                        step.note = f"{len(stale)} stale file(s) to delete"
+                except ValueError as e:
+                    self.logger.warning(f"{e}, estimating a full rsync.")
+            if step.bytes is None:
+                transfer_metrics = TransferMetrics(from_path, destination_path)
+                for line in Process.stream(
+                    [
+                        "rsync",
+                        *rsync_args,
+                        "--dry-run",
+                        "--delete",
+                        f"{from_path}/",
+                        destination_path,
+                    ],
+                    stage="transfer",
+                ):
+                    transfer_metrics.update(line)
+                step.bytes = transfer_metrics.bytes_transferred
+                step.files = transfer_metrics.files_transferred
+        except (subprocess.CalledProcessError, OSError) as e:
+            step.bytes = step.files = None
+            step.note = f"estimate failed: {e}"
+            return step
+        step.duration = self.planner.transfer_duration(transfer.host, step.bytes)
+        return step
+
+    def _order_transfers(
+        self,
+        transfers: list[tuple[Transfer, RepositoryInfo, RepositoryInfo | None]],
+    ) -> list[Transfer]:
+        if self.transfer_order == "largest-first":
+            transfers = sorted(transfers, key=lambda item: -item[1].size)
+        elif self.transfer_order == "stalest-first":
+
+            def staleness(
+                item: tuple[Transfer, RepositoryInfo, RepositoryInfo | None]
+            ) -> float:
+                # A missing destination is the stalest of all.
+                if item[2] is None:
+                    return float("inf")
+                return item[1].last_snapshot_time - item[2].last_snapshot_time
+
+            transfers = sorted(transfers, key=staleness, reverse=True)
+        return [transfer for transfer, _, _ in transfers]
+
+    def _resume_transfers(
+        self,
+        journal: TransferJournal,
+        max_transfers: int,
+        max_transfers_per_host: int,
+    ) -> bool:
+        transfers = journal.load_unfinished()
+        if not transfers:
+            self.logger.info("No unfinished transfers to resume, starting over.")
+            return False
+        self.logger.info(f"Resuming {len(transfers)} unfinished transfer(s)...")
+        self._run_transfers(transfers, max_transfers, max_transfers_per_host, journal)
+        return True
+
+    def _run_transfers(
+        self,
+        transfers: list[Transfer],
+        max_transfers: int,
+        max_transfers_per_host: int,
+        journal: TransferJournal | None = None,
+    ) -> list[TransferResult]:
+        scheduler = TransferScheduler(
+            logger=self.logger,
+            copy=lambda transfer: self._copy(
+                transfer.from_path, transfer.destination_path
+            ),
+            max_transfers=max_transfers,
+            max_transfers_per_host=max_transfers_per_host,
+            retries=self.transfer_retries,
+            retry_delay=self.transfer_retry_delay,
+            on_status=journal.update if journal is not None else None,
+        )
+        results = scheduler.run(transfers)
+        scheduler.print_summary(results)
+        if any(not result.success for result in results):
+            exit(1)
+        return results
+
+    def _has_server_connection(self, external_backup_path: str) -> bool:
+        if self.host_health is None:
+            return Utils.has_server_connection(external_backup_path)
+        remote_server = Utils.get_server_from_path(external_backup_path)
+        return self.host_health.is_up(remote_server)
 
     def _check_repository_directory(self, local_backup_path: str) -> None:
         if not os.path.exists(local_backup_path):
@@ -100,25 +567,73 @@ class BackupCreator:
             self.logger.info(f"Creating folder: '{local_backup_path}'")
             os.makedirs(name=local_backup_path)
 
-    def _get_local_repository_names(self, target_path: str) -> list[str]:
-        return [
-            name
-            for name in os.listdir(target_path)
-            if os.path.isdir(os.path.join(target_path, name))
-        ]
+    def _get_transfer_profile(self, host: str | None) -> TransferProfile:
+        key = host or "local"
+        if key not in self.transfer_profiles:
+            key = "default"
+        profile = self.transfer_profiles.get(key)
+        if profile is None:
+            throughput = None if host is None else self.throughput_history.get(host)
+            return TransferProfile.auto(host is None, throughput)
+        return profile
 
-    def _get_remote_repository_names(self, target_path: str) -> list[str]:
-        host, remote_path = target_path.split(":", 1)
-        cmd = ["ssh", host, f'ls -d {remote_path.rstrip("/") + "/*/"}']
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        return [
-            os.path.basename(line.rstrip("/"))
-            for line in result.stdout.strip().split("\n")
-            if line
-        ]
+    def _get_transfer_host(self, from_path: str, destination_path: str) -> str | None:
+        for path in (from_path, destination_path):
+            if ":" in path:
+                return Utils.get_server_from_path(path)
+        return None
+
+    def _get_rsync_args(self, from_path: str, destination_path: str) -> list[str]:
+        host = self._get_transfer_host(from_path, destination_path)
+        rsync_args = self._get_transfer_profile(host).rsync_args()
+        if host is not None:
+            rsync_args += ["-e", Ssh.rsync_shell(host)]
+        return rsync_args
 
-    def _copy(self, from_path: str, destination_path: str) -> None:
-        subprocess.run(
-            ["rsync", "-arzP", "--delete", f"{from_path}/", destination_path],
-            check=True,
+    def _copy(self, from_path: str, destination_path: str) -> str:
+        host = self._get_transfer_host(from_path, destination_path)
+        rsync_args = self._get_rsync_args(from_path, destination_path)
+
+        transfer_metrics = self.metrics.add_transfer(from_path, destination_path)
+        run_rsync = partial(self._run_rsync, transfer_metrics=transfer_metrics)
+        start = time.monotonic()
+        try:
+            with self.metrics.phase(
+                "transfer", source=from_path, destination=destination_path
+            ):
+                output = None
+                if self.sync_mode == "manifest":
+                    try:
+                        output = RepositorySync(
+                            self.logger, rsync_args, run_rsync
+                        ).sync(from_path, destination_path)
+                    except ValueError as e:
+                        self.logger.warning(f"{e}, falling back to a full rsync.")
+                if output is None:
+                    output = run_rsync(
+                        [
+                            "rsync",
+                            *rsync_args,
+                            "--delete",
+                            f"{from_path}/",
+                            destination_path,
+                        ]
+                    )
+        finally:
+            transfer_metrics.duration = time.monotonic() - start
+            transfer_metrics.finished = True
+
+        self.throughput_history.record(
+            host or "local",
+            transfer_metrics.bytes_transferred,
+            transfer_metrics.duration,
         )
+        return output
+
+    def _run_rsync(self, cmd: list[str], transfer_metrics: TransferMetrics) -> str:
+        output = []
+        for line in Process.stream(cmd, stage="transfer"):
+            if not transfer_metrics.update(line):
+                output.append(line)
+            self.metrics.report_status(self.logger)
+        return "\n".join(output) + "\n"
@@ -0,0 +1,142 @@
+import json
+import os
+import statistics
+from dataclasses import dataclass
+
+from batchup.backup.transfer_profile import ThroughputHistory
+from batchup.logger import SimpleLogger
+from batchup.metrics import RunMetrics
+from batchup.utils import Utils
+
+
+@dataclass
+class PlannedStep:
+    source: str
+    destination: str
+    key: str
+    bytes: int | None = None
+    files: int | None = None
+    duration: float | None = None
+    note: str = ""
+
+
+class Planner:
+    HISTORY_TAIL_BYTES = 4 * 1024 * 1024
+    HISTORY_RUNS = 5
+
+    def __init__(
+        self, logger: SimpleLogger, throughput_history: ThroughputHistory
+    ) -> None:
+        self.logger = logger
+        self.throughput_history = throughput_history
+        self.backup_history = self._load_backup_history()
+
+    def transfer_duration(self, host: str, size: int) -> float | None:
+        if size == 0:
+            return 0.0
+        throughput = self.throughput_history.get(host)
+        if not throughput:
+            return None
+        return size / throughput
+
+    def backup_duration(self, repository: str, bytes_processed: int) -> float | None:
+        runs = self.backup_history.get(repository, [])[-self.HISTORY_RUNS :]
+        if not runs:
+            return None
+        processed = sum(run["total_bytes_processed"] for run in runs)
+        duration = sum(run["duration"] for run in runs)
+        # Scanning dominates small backups, where bytes say little about time.
+        if not processed or not bytes_processed:
+            return statistics.median(run["duration"] for run in runs)
+        return bytes_processed / processed * duration
+
+    def print_plan(
+        self,
+        title: str,
+        steps: list[PlannedStep],
+        max_parallel: int,
+        max_parallel_per_key: int | None = None,
+    ) -> None:
+        if not steps:
+            self.logger.info(f"{title}: nothing to do.")
+            return
+        rows = [
+            (
+                step.source,
+                step.destination,
+                "?" if step.bytes is None else Utils.format_size(step.bytes),
+                "?" if step.files is None else str(step.files),
+                "?" if step.duration is None else f"{step.duration:.1f}s",
+                step.note,
+            )
+            for step in steps
+        ]
+        header = ("Source", "Destination", "Size", "Files", "Estimate", "Note")
+        widths = [max(len(row[i]) for row in rows + [header]) for i in range(6)]
+        line = "  ".join("{:<" + str(width) + "}" for width in widths)
+
+        self.logger.info(f"{title}:")
+        self.logger.write(line.format(*header).rstrip())
+        self.logger.write(line.format(*("-" * width for width in widths)))
+        for row in rows:
+            self.logger.write(line.format(*row).rstrip())
+
+        total_bytes = sum(step.bytes or 0 for step in steps)
+        total = f"{Utils.format_size(total_bytes)} in {len(steps)} step(s)"
+        unknown = [step for step in steps if step.duration is None]
+        duration = self.schedule(
+            [(step.key, step.duration or 0.0) for step in steps],
+            max_parallel,
+            max_parallel_per_key or max_parallel,
+        )
+        if unknown:
+            self.logger.info(
+                f"Total: {total}, at least {duration:.1f}s "
+                f"({len(unknown)} without earlier measurements)"
+            )
+        else:
+            self.logger.info(f"Total: {total}, about {duration:.1f}s")
+
+    @staticmethod
+    def schedule(
+        durations: list[tuple[str, float]], max_parallel: int, max_parallel_per_key: int
+    ) -> float:
+        # Replays TransferScheduler.run: steps start in order as soon as both a
+        # global and a per-host slot are free.
+        max_parallel = max(1, max_parallel)
+        max_parallel_per_key = max(1, max_parallel_per_key)
+        pending = list(durations)
+        running: list[tuple[float, str]] = []
+        now = 0.0
+        while pending:
+            startable = None
+            if len(running) < max_parallel:
+                for index, (key, _) in enumerate(pending):
+                    if sum(1 for _, k in running if k == key) < max_parallel_per_key:
+                        startable = index
+                        break
+            if startable is None:
+                running.sort()
+                now = running.pop(0)[0]
+                continue
+            key, duration = pending.pop(startable)
+            running.append((now + duration, key))
+        return max([now] + [end for end, _ in running])
+
+    def _load_backup_history(self) -> dict[str, list[dict]]:
+        metrics_path = Utils.get_state_path(RunMetrics.METRICS_FILE_NAME)
+        if not os.path.isfile(metrics_path):
+            return {}
+        with open(metrics_path, "rb") as f:
+            f.seek(max(0, os.path.getsize(metrics_path) - self.HISTORY_TAIL_BYTES))
+            lines = f.read().splitlines()
+        history: dict[str, list[dict]] = {}
+        for line in lines:
+            try:
+                run = json.loads(line)
+            except ValueError:
+                continue
+            for backup in run.get("backups", []):
+                if backup.get("finished") and backup.get("duration", 0) > 0:
+                    history.setdefault(backup["repository"], []).append(backup)
+        return history
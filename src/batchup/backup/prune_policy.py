@@ -0,0 +1,69 @@
+import threading
+import time
+from dataclasses import dataclass
+
+from batchup.utils import Utils
+
+
+@dataclass
+class PrunePolicy:
+    interval_days: float | None = 7
+    max_forgotten_snapshots: int | None = None
+    max_unused_percent: float | None = None
+    max_unused: str | None = None
+    max_repack_size: str | None = None
+
+    def prune_args(self) -> list[str]:
+        args = []
+        if self.max_unused is not None:
+            args += ["--max-unused", self.max_unused]
+        if self.max_repack_size is not None:
+            args += ["--max-repack-size", self.max_repack_size]
+        return args
+
+    @staticmethod
+    def from_config(policy: dict) -> "PrunePolicy":
+        return PrunePolicy(
+            interval_days=policy.get("interval-days", 7),
+            max_forgotten_snapshots=policy.get("max-forgotten-snapshots"),
+            max_unused_percent=policy.get("max-unused-percent"),
+            max_unused=policy.get("max-unused"),
+            max_repack_size=policy.get("max-repack-size"),
+        )
+
+
+class PruneState:
+    STATE_FILE_NAME = "prune_state.json"
+
+    _lock = threading.Lock()
+
+    def __init__(self) -> None:
+        self.state_path = Utils.get_state_path(self.STATE_FILE_NAME)
+
+    def get(self, repository_path: str) -> dict:
+        with self._lock:
+            return self._load().get(repository_path, {})
+
+    def add_forgotten(self, repository_path: str, count: int) -> None:
+        with self._lock:
+            state = self._load()
+            entry = state.setdefault(repository_path, {})
+            entry["forgotten-since-prune"] = (
+                entry.get("forgotten-since-prune", 0) + count
+            )
+            self._save(state)
+
+    def record_prune(self, repository_path: str) -> None:
+        with self._lock:
+            state = self._load()
+            state[repository_path] = {
+                "last-prune": time.time(),
+                "forgotten-since-prune": 0,
+            }
+            self._save(state)
+
+    def _load(self) -> dict[str, dict]:
+        return Utils.load_json_state(self.state_path)
+
+    def _save(self, state: dict[str, dict]) -> None:
+        Utils.save_json_state(self.state_path, state, indent=2)
@@ -1,28 +1,182 @@
+import asyncio
 import os
+import shlex
+import signal
+import time
+from dataclasses import dataclass
+from batchup.artifact import Artifact
 from batchup.logger import SimpleLogger
 from batchup.config import Config
+from batchup.host_health import HostHealth
+from batchup.ssh import Ssh
 from batchup.utils import Utils
 
 
+@dataclass
+class RemoteResult:
+    remote_server: str
+    status: str
+    duration: float
+    return_code: int | None = None
+
+
 class RemoteBackup:
+    OUTPUT_LINE_LIMIT = 1024 * 1024
 
-    def __init__(self, logger: SimpleLogger) -> None:
+    def __init__(
+        self,
+        logger: SimpleLogger,
+        host_health: HostHealth,
+        max_concurrency: int = 1,
+        timeout: float | None = None,
+        bootstrap: str = "artifact",
+    ) -> None:
         self.logger = logger
+        self.host_health = host_health
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.bootstrap = bootstrap
+        self.artifact: Artifact | None = None
 
-    def run(self, config: Config) -> None:
+    def run(self, config: Config) -> bool:
+        results: list[RemoteResult] = []
+        remote_servers: list[str] = []
         for external_backup_path in config.remote_backup_paths:
             remote_server = Utils.get_server_from_path(external_backup_path)
-            if not Utils.check_ssh_connection(remote_server):
+            if remote_server in remote_servers:
+                continue
+            if not self.host_health.is_up(remote_server):
                 self.logger.error(
                     f"Could not connect to remote server: '{remote_server}'"
                 )
-            self._backup_on_remote_server(remote_server)
+                results.append(RemoteResult(remote_server, "UNREACHABLE", 0.0))
+                continue
+            remote_servers.append(remote_server)
+
+        if self.bootstrap == "artifact" and remote_servers:
+            self.artifact = Artifact()
+            self.artifact.build()
+            self.logger.debug(f"Built artifact: {self.artifact.path}")
+        results += asyncio.run(self._backup_on_remote_servers(remote_servers))
+        self._print_report(results)
+        return all(result.status == "OK" for result in results)
+
+    async def _backup_on_remote_servers(
+        self, remote_servers: list[str]
+    ) -> list[RemoteResult]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_limited(remote_server: str) -> RemoteResult:
+            async with semaphore:
+                return await self._backup_on_remote_server(remote_server)
+
+        return list(
+            await asyncio.gather(*(run_limited(host) for host in remote_servers))
+        )
+
+    async def _backup_on_remote_server(self, remote_server: str) -> RemoteResult:
+        start = time.monotonic()
+        if self.artifact is not None and not await self._upload_artifact(
+            remote_server, self.artifact
+        ):
+            self.logger.error(f"Failed to upload batchup to server: {remote_server}")
+            return RemoteResult(remote_server, "FAILED", time.monotonic() - start)
+
+        # A single host keeps the interactive terminal so prompts still work.
+        interactive = self.max_concurrency == 1
+        ssh_args = ["-t"] if interactive else ["-o", "BatchMode=yes"]
+        cmd = [
+            "ssh",
+            *ssh_args,
+            *Ssh.options(remote_server),
+            remote_server,
+            f"bash -c {shlex.quote(self._get_remote_command())}",
+        ]
+
+        self.logger.info(f"Running backup on server: {remote_server}")
+        if interactive:
+            process = await asyncio.create_subprocess_exec(*cmd)
+        else:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                limit=self.OUTPUT_LINE_LIMIT,
+                start_new_session=True,
+            )
 
-    def _backup_on_remote_server(self, remote_server: str) -> None:
+        try:
+            await asyncio.wait_for(
+                self._wait_for_process(remote_server, process), self.timeout
+            )
+        except asyncio.TimeoutError:
+            if interactive:
+                process.kill()
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+            await process.wait()
+            self.logger.error(
+                f"Backup timed out after {self.timeout}s on server: {remote_server}"
+            )
+            return RemoteResult(
+                remote_server, "TIMEOUT", time.monotonic() - start, process.returncode
+            )
+
+        duration = time.monotonic() - start
+        if process.returncode != 0:
+            self.logger.error(f"Backup failed on server: {remote_server}")
+            return RemoteResult(remote_server, "FAILED", duration, process.returncode)
+        self.logger.info(f"Finished backup on server: {remote_server}")
+        return RemoteResult(remote_server, "OK", duration, process.returncode)
+
+    async def _wait_for_process(
+        self, remote_server: str, process: asyncio.subprocess.Process
+    ) -> None:
+        if process.stdout is not None:
+            while line := await process.stdout.readline():
+                text = line.decode(errors="replace").rstrip().rsplit("\r", 1)[-1]
+                self.logger.write(f"[{remote_server}] {text}")
+        await process.wait()
+
+    async def _upload_artifact(self, remote_server: str, artifact: Artifact) -> bool:
+        remote_path = shlex.quote(artifact.REMOTE_PATH)
+        # The uploaded file itself is hashed, so a missing or truncated copy
+        # is replaced instead of trusted.
+        process = await asyncio.create_subprocess_exec(
+            *Ssh.command(remote_server, f"sha256sum {remote_path} 2>/dev/null"),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        stdout, _ = await process.communicate()
+        remote_digest = stdout.decode().split(maxsplit=1)[:1]
+        if remote_digest == [artifact.file_digest]:
+            self.logger.debug(f"batchup is up to date on server: {remote_server}")
+            return True
+
+        self.logger.info(f"Uploading batchup to server: {remote_server}")
+        remote_dir = shlex.quote(os.path.dirname(artifact.REMOTE_PATH))
+        with open(artifact.path, "rb") as f:
+            process = await asyncio.create_subprocess_exec(
+                *Ssh.command(
+                    remote_server,
+                    f"mkdir -p {remote_dir} && "
+                    f"cat > {remote_path}.tmp && "
+                    f"mv {remote_path}.tmp {remote_path}",
+                ),
+                stdin=f,
+                stdout=asyncio.subprocess.DEVNULL,
+            )
+            return await process.wait() == 0
+
+    def _get_remote_command(self) -> str:
+        if self.artifact is not None:
+            return f"python3 {shlex.quote(self.artifact.REMOTE_PATH)} backup"
         REPO_DIR = "/tmp"
         REPO_NAME = "batchup"
         REPO_LINK = "https://github.com/ruedoux/batchup.git"
-        command = (
+        return (
             f"cd {REPO_DIR} && "
             f"[ ! -d {REPO_NAME} ] && git clone {REPO_LINK} || true && "
             f"cd {REPO_NAME} && "
@@ -33,12 +187,16 @@ class RemoteBackup:
             f"batchup backup"
         )
 
-        self.logger.info("-" * 16)
-        self.logger.info(f"Running backup on server: {remote_server}")
-        self.logger.info("-" * 16)
-        return_code = os.system(f'ssh -t {remote_server} "bash -c \\"{command}\\""')
-        if return_code != 0:
-            self.logger.error(f"Backup failed on server: {remote_server}")
-        self.logger.info("-" * 16)
-        self.logger.info(f"Finished backup on server: {remote_server}")
-        self.logger.info("-" * 16)
+    def _print_report(self, results: list[RemoteResult]) -> None:
+        if not results:
+            return
+        self.logger.info("Remote backup report:")
+        width = max(len(result.remote_server) for result in results)
+        for result in results:
+            self.logger.write(
+                f"{result.remote_server:<{width}}  {result.status:<11}  "
+                f"{result.duration:.1f}s"
+            )
+        failed = [result for result in results if result.status != "OK"]
+        if failed:
+            self.logger.error(f"{len(failed)} of {len(results)} remote backups failed.")
@@ -0,0 +1,118 @@
+import os
+import shlex
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from batchup.logger import SimpleLogger
+from batchup.ssh import Ssh
+from batchup.tracing import Tracer
+
+
+@dataclass
+class RepositoryInfo:
+    backup_path: str
+    name: str
+    size: int = 0
+    pack_count: int = 0
+    last_snapshot_time: float = 0.0
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.backup_path, self.name)
+
+
+class RepositoryDiscovery:
+    def __init__(self, logger: SimpleLogger) -> None:
+        self.logger = logger
+
+    def discover(
+        self, backup_paths: list[str]
+    ) -> dict[str, dict[str, RepositoryInfo] | None]:
+        if not backup_paths:
+            return {}
+        with Tracer.span("discover-repositories"), ThreadPoolExecutor(
+            max_workers=len(backup_paths)
+        ) as executor:
+            results = executor.map(self._discover, backup_paths)
+            return dict(zip(backup_paths, results))
+
+    def _discover(self, backup_path: str) -> dict[str, RepositoryInfo] | None:
+        try:
+            records = self._list_entries(backup_path)
+        except (subprocess.CalledProcessError, OSError) as e:
+            stderr = getattr(e, "stderr", None)
+            error = stderr.decode(errors="replace").strip() if stderr else e
+            self.logger.error(f"Failed to list repositories at {backup_path}: {error}")
+            return None
+
+        repositories: dict[str, RepositoryInfo] = {}
+        for file_type, relative_path, size, mtime in records:
+            parts = relative_path.split("/")
+            if len(parts) == 1:
+                if file_type == "d":
+                    repositories[parts[0]] = RepositoryInfo(backup_path, parts[0])
+                continue
+            repository = repositories.get(parts[0])
+            if repository is None or file_type != "f":
+                continue
+            repository.size += size
+            if parts[1] == "data":
+                repository.pack_count += 1
+            elif parts[1] == "snapshots":
+                repository.last_snapshot_time = max(
+                    repository.last_snapshot_time, mtime
+                )
+        return repositories
+
+    def _list_entries(self, backup_path: str) -> list[tuple[str, str, int, float]]:
+        if ":" not in backup_path:
+            return self._list_local_entries(backup_path)
+        host, remote_path = backup_path.split(":", 1)
+        quoted_path = shlex.quote(remote_path)
+        # NUL separated records survive any character restic or a user puts
+        # in a repository name.
+        result = subprocess.run(
+            Ssh.command(
+                host,
+                f"if [ -d {quoted_path} ]; then "
+                f"find {quoted_path} -mindepth 1 -printf '%y\\0%P\\0%s\\0%T@\\0'; fi",
+            ),
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            check=True,
+        )
+        fields = result.stdout.split(b"\0")[:-1]
+        return [
+            (
+                fields[index].decode(),
+                fields[index + 1].decode(errors="surrogateescape"),
+                int(fields[index + 2]),
+                float(fields[index + 3]),
+            )
+            for index in range(0, len(fields) - 3, 4)
+        ]
+
+    def _list_local_entries(
+        self, backup_path: str
+    ) -> list[tuple[str, str, int, float]]:
+        entries = []
+        for dir_path, dir_names, file_names in os.walk(backup_path):
+            for name in dir_names:
+                path = os.path.join(dir_path, name)
+                entries.append(("d", os.path.relpath(path, backup_path), 0, 0.0))
+            for name in file_names:
+                path = os.path.join(dir_path, name)
+                try:
+                    stat = os.lstat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append(
+                    (
+                        "f",
+                        os.path.relpath(path, backup_path),
+                        stat.st_size,
+                        stat.st_mtime,
+                    )
+                )
+        return entries
@@ -0,0 +1,143 @@
+import os
+import shlex
+import subprocess
+import tempfile
+from typing import Callable
+
+from batchup.logger import SimpleLogger
+from batchup.ssh import Ssh
+from batchup.tracing import Tracer
+from batchup.utils import Utils
+
+
+class RepositorySync:
+    # Packs and keys go first, the index only once every pack it references
+    # exists, and snapshots last so a reader never sees a dangling reference.
+    TRANSFER_PHASES = [["config", "keys", "data"], ["index"], ["snapshots"]]
+    DELETE_ORDER = ["snapshots", "index", "data", "keys"]
+
+    def __init__(
+        self,
+        logger: SimpleLogger,
+        rsync_args: list[str],
+        run_rsync: Callable[[list[str]], str],
+    ) -> None:
+        self.logger = logger
+        self.rsync_args = rsync_args
+        self.run_rsync = run_rsync
+
+    def sync(self, from_path: str, destination_path: str) -> str:
+        missing, stale = self.diff(from_path, destination_path)
+        self.logger.debug(
+            f"{from_path} -> {destination_path}: "
+            f"{len(missing)} missing, {len(stale)} stale"
+        )
+
+        output = ""
+        for groups in self.TRANSFER_PHASES:
+            names = sorted(name for name in missing if self._group(name) in groups)
+            output += self._transfer(from_path, destination_path, names)
+        for group in self.DELETE_ORDER:
+            names = sorted(name for name in stale if self._group(name) == group)
+            self._delete(destination_path, names)
+        return output
+
+    def diff(
+        self, from_path: str, destination_path: str
+    ) -> tuple[dict[str, int], list[str]]:
+        source = self.list_files(from_path)
+        if "config" not in source:
+            raise ValueError(f"Not a restic repository: '{from_path}'")
+        destination = self.list_files(destination_path)
+
+        missing = {
+            name: size
+            for name, size in source.items()
+            if destination.get(name) != size and self._group(name) is not None
+        }
+        stale = [
+            name
+            for name in destination
+            if name not in source and self._group(name) is not None
+        ]
+        return missing, stale
+
+    def list_files(self, repository_path: str) -> dict[str, int]:
+        with Tracer.span("list-files", repository=repository_path):
+            return self._list_files(repository_path)
+
+    def _list_files(self, repository_path: str) -> dict[str, int]:
+        if ":" not in repository_path:
+            return self._list_local_files(repository_path)
+        host, remote_path = repository_path.split(":", 1)
+        quoted_path = shlex.quote(remote_path)
+        result = subprocess.run(
+            Ssh.command(
+                host,
+                f"if [ -d {quoted_path} ]; then "
+                f"find {quoted_path} -type f -printf '%P\\t%s\\n'; fi",
+            ),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        files = {}
+        for line in result.stdout.splitlines():
+            name, _, size = line.rpartition("\t")
+            if name:
+                files[name] = int(size)
+        return files
+
+    def _list_local_files(self, repository_path: str) -> dict[str, int]:
+        files = {}
+        for dir_path, _, file_names in os.walk(repository_path):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                files[os.path.relpath(path, repository_path)] = os.path.getsize(path)
+        return files
+
+    def _group(self, name: str) -> str | None:
+        if name == "config":
+            return "config"
+        group = name.split("/", 1)[0]
+        if group in ("keys", "data", "index", "snapshots") and "/" in name:
+            return group
+        return None
+
+    def _transfer(
+        self,
+        from_path: str,
+        destination_path: str,
+        names: list[str],
+    ) -> str:
+        if not names:
+            return ""
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as files_from:
+            files_from.write("\n".join(names) + "\n")
+            files_from.flush()
+            return self.run_rsync(
+                [
+                    "rsync",
+                    *self.rsync_args,
+                    f"--files-from={files_from.name}",
+                    f"{from_path}/",
+                    f"{destination_path}/",
+                ]
+            )
+
+    def _delete(self, repository_path: str, names: list[str]) -> None:
+        if not names:
+            return
+        if ":" not in repository_path:
+            for name in names:
+                os.remove(os.path.join(repository_path, name))
+            return
+        host = Utils.get_server_from_path(repository_path)
+        remote_path = repository_path.split(":", 1)[1]
+        subprocess.run(
+            Ssh.command(host, f"cd {shlex.quote(remote_path)} && xargs -0 rm -f --"),
+            input="\0".join(names),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
@@ -1,12 +1,31 @@
+import json
 import os
+import socket
 import subprocess
+import sys
+import time
+from batchup.backup.prune_policy import PrunePolicy, PruneState
 from batchup.logger import SimpleLogger
+from batchup.metrics import BackupMetrics, RunMetrics
+from batchup.process import Process
+from batchup.tracing import Tracer
+from batchup.utils import Utils
 
 
 class Restic:
+    DEFAULT_RETENTION = {"keep-within-daily": "7d", "keep-within-weekly": "1m"}
+    SNAPSHOT_TAGS = ["main", "watch"]
 
-    def __init__(self, logger: SimpleLogger) -> None:
+    def __init__(
+        self,
+        logger: SimpleLogger,
+        metrics: RunMetrics | None = None,
+        create_repository: str = "ask",
+    ) -> None:
         self.logger = logger
+        self.metrics = metrics or RunMetrics(command="")
+        self.create_repository = create_repository
+        self.prune_state = PruneState()
 
     def backup_repository(
         self,
@@ -14,97 +33,373 @@ class Restic:
         include_file_path: str,
         exclude_file_path: str,
         password: str,
+        read_concurrency: int | None = None,
+        pack_size: int | None = None,
+        capture_output: bool = False,
+        list_snapshots: int = 0,
+        retention: dict[str, str] | None = None,
+        prune_policy: PrunePolicy | None = None,
+        tag: str = "main",
     ) -> bool:
+        env = self._get_env(password)
+        global_args = ["restic", "-r", backup_target_path]
+        if pack_size is not None:
+            global_args += ["--pack-size", str(pack_size)]
+        backup_args = []
+        if read_concurrency is not None:
+            backup_args += ["--read-concurrency", str(read_concurrency)]
+
+        try:
+            self.logger.info(f"Backup to local repository: {backup_target_path}")
+            with self.metrics.phase("restic-backup", repository=backup_target_path):
+                self._run_backup(
+                    [
+                        *global_args,
+                        "backup",
+                        "--json",
+                        "--files-from",
+                        include_file_path,
+                        "--iexclude-file",
+                        exclude_file_path,
+                        "--tag",
+                        tag,
+                        "--compression",
+                        "max",
+                        *backup_args,
+                    ],
+                    env,
+                    self.metrics.add_backup(backup_target_path),
+                )
+            with self.metrics.phase("restic-forget", repository=backup_target_path):
+                self._forget(backup_target_path, env, retention, tag)
+            if prune_policy is not None:
+                with self.metrics.phase("restic-prune", repository=backup_target_path):
+                    self._prune_if_due(
+                        backup_target_path, env, prune_policy, False, capture_output
+                    )
+            if list_snapshots > 0:
+                with Tracer.span("restic-snapshots", repository=backup_target_path):
+                    self._list_snapshots(backup_target_path, env, list_snapshots)
+        except subprocess.CalledProcessError as e:
+            self.logger.error(f"Restic failed for '{backup_target_path}': {e}")
+            if e.stderr:
+                self.logger.error(e.stderr)
+            return False
+        return True
+
+    def estimate_backup(
+        self,
+        backup_target_path: str,
+        include_file_path: str,
+        exclude_file_path: str,
+        password: str,
+    ) -> BackupMetrics | None:
+        # Not added to the run metrics: nothing is written to the repository.
+        backup_metrics = BackupMetrics(repository=backup_target_path)
+        try:
+            with Tracer.span("restic-dry-run", repository=backup_target_path):
+                for line in Process.stream(
+                    [
+                        "restic",
+                        "-r",
+                        backup_target_path,
+                        "backup",
+                        "--dry-run",
+                        "--json",
+                        "--files-from",
+                        include_file_path,
+                        "--iexclude-file",
+                        exclude_file_path,
+                    ],
+                    self._get_env(password),
+                    "backup",
+                ):
+                    try:
+                        backup_metrics.update(json.loads(line))
+                    except ValueError:
+                        self.logger.debug(f"\t{line}")
+        except subprocess.CalledProcessError as e:
+            self.logger.error(f"Restic dry run failed for '{backup_target_path}': {e}")
+            if e.stderr:
+                self.logger.error(e.stderr)
+            return None
+        return backup_metrics
+
+    def prune_repository(
+        self,
+        backup_target_path: str,
+        password: str,
+        retention: dict[str, str] | None,
+        prune_policy: PrunePolicy,
+        force: bool = False,
+    ) -> bool:
+        env = self._get_env(password)
+        try:
+            for tag in self.SNAPSHOT_TAGS:
+                self._forget(backup_target_path, env, retention, tag)
+            self._prune_if_due(backup_target_path, env, prune_policy, force, False)
+        except subprocess.CalledProcessError as e:
+            self.logger.error(f"Restic failed for '{backup_target_path}': {e}")
+            if e.stderr:
+                self.logger.error(e.stderr)
+            return False
+        return True
+
+    def check_repository(
+        self,
+        backup_target_path: str,
+        password: str,
+        read_data_subset: str | None = None,
+    ) -> bool:
+        cmd = ["restic", "-r", backup_target_path, "check"]
+        if read_data_subset is not None:
+            cmd += ["--read-data-subset", read_data_subset]
+        try:
+            with self.metrics.phase("restic-check", repository=backup_target_path):
+                self._run(cmd, self._get_env(password), True, "verify")
+        except subprocess.CalledProcessError as e:
+            self.logger.error(f"Restic check failed for '{backup_target_path}': {e}")
+            for output in (e.stdout, e.stderr):
+                if output:
+                    self.logger.error(output.strip())
+            return False
+        return True
+
+    def prepare_repository(self, backup_target_path: str, password: str) -> bool:
+        with Tracer.span("restic-verify", repository=backup_target_path):
+            return self._prepare_repository(backup_target_path, password)
+
+    def _prepare_repository(self, backup_target_path: str, password: str) -> bool:
         if not self._verify_restic_repo(backup_target_path, password):
             self.logger.error("No restic repo found and not created.")
             return False
         if not self._verify_password(backup_target_path, password):
             self.logger.error("Restic password is wrong.")
             return False
+        return True
 
-        os.environ["RESTIC_PASSWORD"] = password
+    def _run_backup(
+        self, cmd: list[str], env: dict[str, str], backup_metrics: BackupMetrics
+    ) -> None:
         try:
-            self.logger.info(f"Backup to local repository: {backup_target_path}")
-            subprocess.run(
-                [
-                    "restic",
-                    "-r",
-                    backup_target_path,
-                    "backup",
-                    "--files-from",
-                    include_file_path,
-                    "--iexclude-file",
-                    exclude_file_path,
-                    "--tag",
-                    "main",
-                    "--compression",
-                    "max",
-                ],
-                check=True,
-            )
-            self.logger.info(f"Prune old snapshots: {backup_target_path}")
-            subprocess.run(
-                [
-                    "restic",
-                    "-r",
-                    backup_target_path,
-                    "forget",
-                    "--keep-within-daily",
-                    "7d",
-                    "--keep-within-weekly",
-                    "1m",
-                    "--prune",
-                ],
-                check=True,
-            )
-            self.logger.info(f"Snapshots for {backup_target_path}:")
-            subprocess.run(
-                ["restic", "-r", backup_target_path, "snapshots"], check=True
-            )
+            for line in Process.stream(cmd, env, "backup"):
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    self.logger.debug(f"\t{line}")
+                    continue
+                if message.get("message_type") == "error":
+                    error = message.get("error", {}).get("message", message)
+                    self.logger.warning(f"{message.get('item', '')}: {error}")
+                backup_metrics.update(message)
+                self.metrics.report_status(self.logger)
         finally:
-            os.environ["RESTIC_PASSWORD"] = ""
-        return True
+            backup_metrics.finished = True
+
+        self.logger.info(
+            f"Snapshot {backup_metrics.snapshot_id[:8]} of "
+            f"{backup_metrics.repository}: "
+            f"{Utils.format_size(backup_metrics.total_bytes_processed)} processed, "
+            f"{Utils.format_size(backup_metrics.data_added)} added, "
+            f"{backup_metrics.files_new} new / "
+            f"{backup_metrics.files_changed} changed files, "
+            f"{backup_metrics.duration:.1f}s"
+        )
+
+    def _forget(
+        self,
+        backup_target_path: str,
+        env: dict[str, str],
+        retention: dict[str, str] | None,
+        tag: str,
+    ) -> None:
+        self.logger.info(f"Forget old {tag} snapshots: {backup_target_path}")
+        forget_args = ["--tag", tag]
+        if tag == "watch":
+            # Each watch snapshot holds a different set of changed paths, so
+            # restic's default host and paths grouping would leave every one
+            # alone in its group, where keep-within never drops it.
+            forget_args += ["--group-by", "host,tags"]
+        for key, value in (retention or self.DEFAULT_RETENTION).items():
+            forget_args += [f"--{key}", str(value)]
+        result = Process.run(
+            ["restic", "-r", backup_target_path, "forget", "--json", *forget_args],
+            "prune",
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        groups = json.loads(result.stdout or "[]") or []
+        forgotten = sum(len(group.get("remove") or []) for group in groups)
+        self.logger.debug(f"Forgot {forgotten} snapshot(s) in {backup_target_path}")
+        self.prune_state.add_forgotten(backup_target_path, forgotten)
+
+    def _prune_if_due(
+        self,
+        backup_target_path: str,
+        env: dict[str, str],
+        prune_policy: PrunePolicy,
+        force: bool,
+        capture_output: bool,
+    ) -> None:
+        reason: str | None = "forced"
+        if not force:
+            reason = self._get_prune_reason(backup_target_path, env, prune_policy)
+        if reason is None:
+            self.logger.info(f"Prune not due yet: {backup_target_path}")
+            return
+
+        self.logger.info(f"Prune ({reason}): {backup_target_path}")
+        self._run(
+            ["restic", "-r", backup_target_path, "prune", *prune_policy.prune_args()],
+            env,
+            capture_output,
+            "prune",
+        )
+        self.prune_state.record_prune(backup_target_path)
+
+    def _get_prune_reason(
+        self,
+        backup_target_path: str,
+        env: dict[str, str],
+        prune_policy: PrunePolicy,
+    ) -> str | None:
+        state = self.prune_state.get(backup_target_path)
+        if prune_policy.interval_days is not None:
+            last_prune = state.get("last-prune")
+            interval = prune_policy.interval_days * 24 * 60 * 60
+            if last_prune is None or time.time() - last_prune >= interval:
+                return "interval elapsed"
+        if prune_policy.max_forgotten_snapshots is not None:
+            forgotten = state.get("forgotten-since-prune", 0)
+            if forgotten >= prune_policy.max_forgotten_snapshots:
+                return f"{forgotten} forgotten snapshots"
+        if prune_policy.max_unused_percent is not None:
+            unused_percent = self._estimate_unused_percent(backup_target_path, env)
+            if unused_percent >= prune_policy.max_unused_percent:
+                return f"{unused_percent:.1f}% unused"
+        return None
+
+    def _estimate_unused_percent(
+        self, backup_target_path: str, env: dict[str, str]
+    ) -> float:
+        result = Process.run(
+            [
+                "restic",
+                "-r",
+                backup_target_path,
+                "stats",
+                "--json",
+                "--no-lock",
+                "--mode",
+                "raw-data",
+            ],
+            "prune",
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        used_size = json.loads(result.stdout)["total_size"]
+        disk_size = 0
+        data_path = os.path.join(backup_target_path, "data")
+        for dir_path, _, file_names in os.walk(data_path):
+            for file_name in file_names:
+                disk_size += os.path.getsize(os.path.join(dir_path, file_name))
+        if disk_size == 0:
+            return 0.0
+        return max(0, disk_size - used_size) * 100 / disk_size
+
+    def _list_snapshots(
+        self, backup_target_path: str, env: dict[str, str], count: int
+    ) -> None:
+        result = Process.run(
+            [
+                "restic",
+                "-r",
+                backup_target_path,
+                "snapshots",
+                "--json",
+                "--no-lock",
+                "--host",
+                socket.gethostname(),
+                "--tag",
+                "main",
+            ],
+            "backup",
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        snapshots = json.loads(result.stdout or "[]")
+        self.logger.info(
+            f"Latest snapshots for {backup_target_path} ({len(snapshots)} total):"
+        )
+        for snapshot in snapshots[-count:]:
+            self.logger.info(
+                f"\t{snapshot['short_id']}  {snapshot['time'][:19]}  "
+                f"{', '.join(snapshot.get('paths', []))}"
+            )
+
+    def _run(
+        self, cmd: list[str], env: dict[str, str], capture_output: bool, stage: str
+    ) -> None:
+        result = Process.run(
+            cmd, stage, env=env, check=True, capture_output=capture_output, text=True
+        )
+        if capture_output:
+            for line in result.stdout.splitlines():
+                self.logger.debug(f"\t{line}")
+
+    def _get_env(self, password: str) -> dict[str, str]:
+        return {**os.environ, "RESTIC_PASSWORD": password}
 
     def _verify_restic_repo(self, backup_target_path: str, password: str) -> bool:
         if not os.path.isfile(os.path.join(backup_target_path, "config")):
             self.logger.warning(f"No repo detected at: {backup_target_path}")
-            answer = input("Do you want to create a new repo? [Y/n] ").strip().lower()
-            if answer and answer != "y":
+            if not self._should_create_repo():
                 return False
             self._create_new_repo(backup_target_path, password)
         return True
 
+    def _should_create_repo(self) -> bool:
+        if self.create_repository == "always":
+            return True
+        if self.create_repository == "never" or not sys.stdin.isatty():
+            return False
+        answer = input("Do you want to create a new repo? [Y/n] ").strip().lower()
+        return not answer or answer == "y"
+
     def _create_new_repo(self, backup_target_path: str, password: str) -> None:
-        os.environ["RESTIC_PASSWORD"] = password
-        try:
-            result = subprocess.run(
-                ["restic", "init", "--repo", backup_target_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
+        result = Process.run(
+            ["restic", "init", "--repo", backup_target_path],
+            "backup",
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=self._get_env(password),
+        )
+        if result.returncode != 0:
+            self.logger.error(
+                f"Failed to create restic repository at '{backup_target_path}'"
             )
-            if result.returncode != 0:
-                self.logger.error(
-                    f"Failed to create restic repository at '{backup_target_path}'"
-                )
-                self.logger.error(result.stdout)
-                self.logger.error(result.stderr)
-                exit(1)
-        finally:
-            os.environ["RESTIC_PASSWORD"] = ""
+            self.logger.error(result.stdout)
+            self.logger.error(result.stderr)
+            exit(1)
 
     def _verify_password(self, backup_target_path: str, password: str) -> bool:
-        os.environ["RESTIC_PASSWORD"] = password
-        try:
-            result = subprocess.run(
-                ["restic", "-r", backup_target_path, "snapshots"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-            if result.returncode != 0:
-                self.logger.error(f"Wrong password for '{backup_target_path}'")
-                return False
-            return True
-        finally:
-            os.environ["RESTIC_PASSWORD"] = ""
+        # "cat config" only has to decrypt a key, unlike listing snapshots.
+        result = Process.run(
+            ["restic", "-r", backup_target_path, "cat", "config", "--no-lock"],
+            "backup",
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=self._get_env(password),
+        )
+        if result.returncode != 0:
+            self.logger.error(f"Wrong password for '{backup_target_path}'")
+            return False
+        return True
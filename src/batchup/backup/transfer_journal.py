@@ -0,0 +1,57 @@
+import threading
+import time
+
+from batchup.backup.transfer_scheduler import Transfer
+from batchup.utils import Utils
+
+
+class TransferJournal:
+    JOURNAL_FILE_NAME = "transfer-journal-{command}.json"
+
+    def __init__(self, command: str) -> None:
+        self.path = Utils.get_state_path(
+            self.JOURNAL_FILE_NAME.format(command=command)
+        )
+        self.lock = threading.Lock()
+        self.entries: list[dict] = []
+
+    def begin(self, transfers: list[Transfer]) -> None:
+        with self.lock:
+            self.entries = [
+                {
+                    "from": transfer.from_path,
+                    "destination": transfer.destination_path,
+                    "status": "pending",
+                    "attempts": 0,
+                }
+                for transfer in transfers
+            ]
+            self._save()
+
+    def load_unfinished(self) -> list[Transfer]:
+        entries = Utils.load_json_state(self.path).get("transfers", [])
+        with self.lock:
+            self.entries = entries
+        return [
+            Transfer(entry["from"], entry["destination"])
+            for entry in entries
+            if entry["status"] != "done"
+        ]
+
+    def update(self, transfer: Transfer, status: str, error: str = "") -> None:
+        with self.lock:
+            for entry in self.entries:
+                if (
+                    entry["from"] == transfer.from_path
+                    and entry["destination"] == transfer.destination_path
+                ):
+                    entry["status"] = status
+                    entry["error"] = error
+                    entry["time"] = time.time()
+                    if status == "started":
+                        entry["attempts"] += 1
+                    break
+            self._save()
+
+    def _save(self) -> None:
+        Utils.save_json_state(self.path, {"transfers": self.entries}, indent=2)
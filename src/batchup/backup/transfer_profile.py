@@ -0,0 +1,101 @@
+import json
+import threading
+from dataclasses import dataclass
+
+from batchup.utils import Utils
+
+
+@dataclass
+class TransferProfile:
+    compress: bool = False
+    checksum: bool = False
+    bwlimit: str | None = None
+    whole_file: bool = False
+
+    # Links at least this fast gain nothing from rsync's delta algorithm.
+    FAST_LINK_BYTES_PER_SECOND = 50 * 1024 * 1024
+
+    def rsync_args(self) -> list[str]:
+        args = [
+            "-ar",
+            "--partial",
+            "--info=progress2",
+            "--stats",
+            "--no-human-readable",
+        ]
+        if self.compress:
+            args.append("-z")
+        if self.checksum:
+            args.append("--checksum")
+        if self.bwlimit:
+            args.append(f"--bwlimit={self.bwlimit}")
+        if self.whole_file:
+            args.append("--whole-file")
+        return args
+
+    @staticmethod
+    def from_config(profile: dict) -> "TransferProfile":
+        return TransferProfile(
+            compress=profile.get("compress", False),
+            checksum=profile.get("checksum", False),
+            bwlimit=profile.get("bwlimit"),
+            whole_file=profile.get("whole-file", False),
+        )
+
+    @staticmethod
+    def parse_profiles(profiles: dict) -> "dict[str, TransferProfile | None]":
+        # None stands for "auto", which is only resolved once the host is known.
+        parsed: dict[str, TransferProfile | None] = {}
+        for host, profile in profiles.items():
+            if profile == "auto":
+                parsed[host] = None
+            elif isinstance(profile, dict):
+                parsed[host] = TransferProfile.from_config(profile)
+            else:
+                raise ValueError(
+                    f"Transfer profile for '{host}' must be \"auto\" or an object, "
+                    f"not {json.dumps(profile)}"
+                )
+        return parsed
+
+    @staticmethod
+    def auto(is_local: bool, throughput: float | None) -> "TransferProfile":
+        # Restic packs are already compressed and encrypted, so -z only costs
+        # CPU. Delta transfer is kept on slow links where resuming a partial
+        # pack is worth it.
+        if is_local:
+            return TransferProfile(whole_file=True)
+        is_fast = (
+            throughput is not None
+            and throughput >= TransferProfile.FAST_LINK_BYTES_PER_SECOND
+        )
+        return TransferProfile(whole_file=is_fast)
+
+
+class ThroughputHistory:
+    CACHE_FILE_NAME = "throughput.json"
+    # Minimum transfer size for a measurement to be representative.
+    MIN_SAMPLE_BYTES = 16 * 1024 * 1024
+    SMOOTHING = 0.3
+
+    def __init__(self) -> None:
+        self.cache_path = Utils.get_cache_path(self.CACHE_FILE_NAME)
+        self.lock = threading.Lock()
+        self.throughputs = self._load()
+
+    def get(self, host: str) -> float | None:
+        return self.throughputs.get(host)
+
+    def record(self, host: str, transferred_bytes: int, duration: float) -> None:
+        if transferred_bytes < self.MIN_SAMPLE_BYTES or duration <= 0:
+            return
+        sample = transferred_bytes / duration
+        with self.lock:
+            previous = self.throughputs.get(host)
+            if previous is not None:
+                sample = self.SMOOTHING * sample + (1 - self.SMOOTHING) * previous
+            self.throughputs[host] = sample
+            Utils.save_json_state(self.cache_path, self.throughputs)
+
+    def _load(self) -> dict[str, float]:
+        return Utils.load_json_state(self.cache_path)
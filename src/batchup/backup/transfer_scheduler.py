@@ -0,0 +1,165 @@
+import subprocess
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable
+
+from batchup.logger import SimpleLogger
+from batchup.utils import Utils
+
+
+@dataclass
+class Transfer:
+    from_path: str
+    destination_path: str
+
+    @property
+    def host(self) -> str:
+        for path in (self.from_path, self.destination_path):
+            if ":" in path:
+                return Utils.get_server_from_path(path)
+        return "local"
+
+
+@dataclass
+class TransferResult:
+    transfer: Transfer
+    success: bool
+    duration: float
+    error: str = ""
+    attempts: int = 1
+
+
+class TransferScheduler:
+    MAX_RETRY_DELAY = 300.0
+
+    def __init__(
+        self,
+        logger: SimpleLogger,
+        copy: Callable[[Transfer], str],
+        max_transfers: int,
+        max_transfers_per_host: int,
+        retries: int = 0,
+        retry_delay: float = 5.0,
+        on_status: Callable[[Transfer, str, str], None] | None = None,
+    ) -> None:
+        self.logger = logger
+        self.copy = copy
+        self.max_transfers = max(1, max_transfers)
+        self.max_transfers_per_host = max(1, max_transfers_per_host)
+        self.retries = max(0, retries)
+        self.retry_delay = retry_delay
+        self.on_status = on_status
+        self.output_lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def run(self, transfers: list[Transfer]) -> list[TransferResult]:
+        pending = list(transfers)
+        running: dict[Future[TransferResult], str] = {}
+        host_usage: dict[str, int] = {}
+        results: list[TransferResult] = []
+
+        with ThreadPoolExecutor(max_workers=self.max_transfers) as executor:
+            try:
+                while pending or running:
+                    for transfer in list(pending):
+                        if len(running) >= self.max_transfers:
+                            break
+                        host = transfer.host
+                        if host_usage.get(host, 0) >= self.max_transfers_per_host:
+                            continue
+                        pending.remove(transfer)
+                        host_usage[host] = host_usage.get(host, 0) + 1
+                        running[executor.submit(self._run_transfer, transfer)] = host
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        host = running.pop(future)
+                        host_usage[host] -= 1
+                        results.append(future.result())
+            except KeyboardInterrupt:
+                # Running transfers see the interrupt too; keep them from retrying.
+                self.stop_event.set()
+                raise
+
+        order = {id(transfer): index for index, transfer in enumerate(transfers)}
+        return sorted(results, key=lambda result: order[id(result.transfer)])
+
+    def print_summary(self, results: list[TransferResult]) -> None:
+        if not results:
+            return
+        rows = [
+            (
+                result.transfer.from_path,
+                result.transfer.destination_path,
+                ("OK" if result.success else "FAILED")
+                + (f" ({result.attempts} tries)" if result.attempts > 1 else ""),
+                f"{result.duration:.1f}s",
+            )
+            for result in results
+        ]
+        header = ("Source", "Destination", "Status", "Duration")
+        widths = [max(len(row[i]) for row in rows + [header]) for i in range(4)]
+        line = "  ".join("{:<" + str(width) + "}" for width in widths)
+
+        self.logger.info("Transfer summary:")
+        self.logger.write(line.format(*header).rstrip())
+        self.logger.write(line.format(*("-" * width for width in widths)))
+        for row in rows:
+            self.logger.write(line.format(*row).rstrip())
+
+        failed = [result for result in results if not result.success]
+        if failed:
+            self.logger.error(f"{len(failed)} of {len(results)} transfers failed.")
+            for result in failed:
+                self.logger.error(
+                    f"{result.transfer.from_path} -> "
+                    f"{result.transfer.destination_path}: {result.error}"
+                )
+
+    def _run_transfer(self, transfer: Transfer) -> TransferResult:
+        start = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            self._report_status(transfer, "started")
+            output, error = self._copy(transfer)
+            if not error or attempts > self.retries or self.stop_event.is_set():
+                break
+            delay = min(self.retry_delay * 2 ** (attempts - 1), self.MAX_RETRY_DELAY)
+            self.logger.warning(
+                f"-> Retrying {transfer.from_path} -> {transfer.destination_path} "
+                f"in {delay:g}s (attempt {attempts + 1} of {self.retries + 1}): "
+                f"{error}"
+            )
+            if self.stop_event.wait(delay):
+                break
+        duration = time.monotonic() - start
+        self._report_status(transfer, "failed" if error else "done", error)
+
+        with self.output_lock:
+            self.logger.info(
+                f"-> Finished {transfer.from_path} -> {transfer.destination_path}"
+            )
+            for line in output.splitlines():
+                self.logger.debug(f"\t{line}")
+        return TransferResult(
+            transfer=transfer,
+            success=not error,
+            duration=duration,
+            error=error,
+            attempts=attempts,
+        )
+
+    def _copy(self, transfer: Transfer) -> tuple[str, str]:
+        try:
+            return self.copy(transfer), ""
+        except subprocess.CalledProcessError as e:
+            return e.stdout or "", (e.stderr or "").strip() or str(e)
+        except OSError as e:
+            return "", str(e)
+
+    def _report_status(self, transfer: Transfer, status: str, error: str = "") -> None:
+        if self.on_status is not None:
+            self.on_status(transfer, status, error)
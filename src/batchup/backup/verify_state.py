@@ -0,0 +1,48 @@
+import threading
+import time
+
+from batchup.utils import Utils
+
+
+class VerifyState:
+    STATE_FILE_NAME = "verify_state.json"
+
+    _lock = threading.Lock()
+
+    def __init__(self) -> None:
+        self.state_path = Utils.get_state_path(self.STATE_FILE_NAME)
+
+    def next_slice(self, repository_path: str, slices: int) -> int:
+        with self._lock:
+            entry = self._load().get(repository_path, {}).get(str(slices), {})
+        return entry.get("next-slice", 1)
+
+    def record_check(
+        self, repository_path: str, data_slice: int, slices: int, success: bool
+    ) -> None:
+        with self._lock:
+            state = self._load()
+            # Each slice count keeps its own rotation, so an occasional full
+            # check does not restart the nightly cycle.
+            cycles = state.setdefault(repository_path, {})
+            entry = cycles.get(str(slices), {"next-slice": 1, "covered": []})
+            now = time.time()
+            entry["last-check"] = now
+            entry["last-slice"] = data_slice
+            entry["last-result"] = "ok" if success else "failed"
+            # A failed slice is checked again next time instead of skipped.
+            if success:
+                covered = set(entry["covered"]) | {data_slice}
+                if len(covered) >= slices:
+                    entry["last-full-cycle"] = now
+                    covered = set()
+                entry["covered"] = sorted(covered)
+                entry["next-slice"] = data_slice % slices + 1
+            cycles[str(slices)] = entry
+            self._save(state)
+
+    def _load(self) -> dict[str, dict]:
+        return Utils.load_json_state(self.state_path)
+
+    def _save(self, state: dict[str, dict]) -> None:
+        Utils.save_json_state(self.state_path, state, indent=2)
@@ -1,72 +1,198 @@
+from __future__ import annotations
+
 from argparse import Namespace
 import argparse
-import getpass
 import os
-import tempfile
-from batchup.backup.backup_creator import BackupCreator
-from batchup.backup.remote_backup import RemoteBackup
-from batchup.config import Config
+from typing import TYPE_CHECKING
+from batchup.init import Init
 from batchup.logger import SimpleLogger
+from batchup.tracing import Tracer
+
+# Subsystems are imported by the commands that use them to keep startup fast.
+if TYPE_CHECKING:
+    from batchup.config import BackupJob, Config
+    from batchup.host_health import HostHealth
+    from batchup.metrics import RunMetrics
 
 
 class Commands:
+    metrics: RunMetrics
 
     def __init__(self, logger: SimpleLogger) -> None:
         self.logger = logger
 
     def backup(self, args: Namespace) -> None:
+        import tempfile
+        from batchup.backup.backup_creator import BackupCreator
+        from batchup.password_source import PasswordSource
+
         self.logger.info(f"Running backup...")
         config_path: str = args.config
         if not os.path.isfile(config_path):
             self.logger.error(f"Configuration does not exist: {config_path}")
             exit(1)
+        if args.replicate:
+            Init(self.logger).check_requirements(["rsync", "ssh"])
 
-        config = Config(config_path)
+        config = self._load_config(config_path)
         with tempfile.TemporaryDirectory() as temp_dir_path:
             local_backup_path = config.local_backup_path
-            local_backup_name = config.local_backup_name
-            include_file_path = f"{temp_dir_path}/i.txt"
-            exclude_file_path = f"{temp_dir_path}/e.txt"
-            includes = config.includes.copy()
-            excludes = config.excludes.copy()
-
-            excludes = excludes + config.matched_excludes
-            with open(include_file_path, "w") as f:
-                for line in includes:
-                    f.write(line + "\n")
-            with open(exclude_file_path, "w") as f:
-                for line in excludes:
-                    f.write(line + "\n")
+            jobs: list[tuple[BackupJob, str, str]] = []
+            for index, job in enumerate(config.jobs):
+                include_file_path = f"{temp_dir_path}/i{index}.txt"
+                exclude_file_path = f"{temp_dir_path}/e{index}.txt"
+                includes = job.includes.copy()
+                with self.metrics.phase("exclude-scan", job=job.name):
+                    excludes = job.get_exclude_paths()
+                with Tracer.span("write-file-lists", job=job.name):
+                    with open(include_file_path, "w") as f:
+                        for line in includes:
+                            f.write(line + "\n")
+                    with open(exclude_file_path, "w") as f:
+                        for line in excludes:
+                            f.write(line + "\n")
+                jobs.append((job, include_file_path, exclude_file_path))
+
+                self.logger.debug(f"Job '{job.name}' -> {job.repository_name}")
+                self.logger.debug("Local include paths:")
+                for path in includes:
+                    self.logger.debug(f"\t{path}")
+                self.logger.debug("Local exclude paths:")
+                for path in excludes:
+                    self.logger.debug(f"\t{path}")
 
             self.logger.info(f"Local backup path: {config.local_backup_path}")
-            self.logger.debug("Local include paths:")
-            for path in includes:
-                self.logger.debug(f"\t{path}")
-            self.logger.debug("Local exclude paths:")
-            for path in excludes:
-                self.logger.debug(f"\t{path}")
-            password = getpass.getpass(prompt="Input password: ")
-            backup_creator = BackupCreator(logger=self.logger)
+            with Tracer.span("password"):
+                password = PasswordSource(self.logger, config.password).get()
+            backup_creator = BackupCreator(
+                logger=self.logger,
+                metrics=self.metrics,
+                create_repository=config.create_repository,
+            )
             backup_creator.backup_local(
                 local_backup_path=local_backup_path,
-                local_backup_name=local_backup_name,
-                include_file_path=include_file_path,
-                exclude_file_path=exclude_file_path,
+                jobs=jobs,
                 password=password,
+                max_backup_jobs=config.max_backup_jobs,
+                list_snapshots=config.list_snapshots,
+                plan=args.plan,
             )
 
+        if args.replicate:
+            if args.plan:
+                self.logger.info("Replication sizes exclude the new backup data.")
+            host_health = self._probe_hosts(config)
+            backup_creator = BackupCreator(
+                logger=self.logger,
+                host_health=host_health,
+                sync_mode=config.sync_mode,
+                transfer_profiles=config.transfer_profiles,
+                metrics=self.metrics,
+                transfer_retries=config.transfer_retries,
+                transfer_retry_delay=config.transfer_retry_delay,
+            )
+            # Only the repositories written by this run, not pulled ones.
+            backup_creator.replicate_local(
+                local_backup_path=config.local_backup_path,
+                repository_names=list(
+                    dict.fromkeys(job.repository_name for job in config.jobs)
+                ),
+                remote_backup_paths=config.remote_backup_paths,
+                max_transfers=config.max_transfers,
+                max_transfers_per_host=config.max_transfers_per_host,
+                plan=args.plan,
+            )
+
+        self.logger.info(f"Done!")
+
+    def watch(self, args: Namespace) -> None:
+        from batchup.backup.backup_creator import BackupCreator
+        from batchup.password_source import PasswordSource
+
+        self.logger.info(f"Running watch...")
+        config_path: str = args.config
+        if not os.path.isfile(config_path):
+            self.logger.error(f"Configuration does not exist: {config_path}")
+            exit(1)
+
+        config = self._load_config(config_path)
+        password = PasswordSource(self.logger, config.password).get()
+        backup_creator = BackupCreator(
+            logger=self.logger,
+            metrics=self.metrics,
+            create_repository=config.create_repository,
+        )
+        try:
+            backup_creator.watch_local(
+                local_backup_path=config.local_backup_path,
+                jobs=config.jobs,
+                password=password,
+                debounce=config.watch_debounce,
+                min_interval=config.watch_min_interval,
+            )
+        except KeyboardInterrupt:
+            self.logger.info("Stopped watching.")
+        except OSError as e:
+            self.logger.error(f"Watch failed: {e}")
+            exit(1)
+
+    def prune(self, args: Namespace) -> None:
+        from batchup.backup.backup_creator import BackupCreator
+        from batchup.password_source import PasswordSource
+
+        self.logger.info(f"Running prune...")
+        config_path: str = args.config
+        if not os.path.isfile(config_path):
+            self.logger.error(f"Configuration does not exist: {config_path}")
+            exit(1)
+
+        config = self._load_config(config_path)
+        password = PasswordSource(self.logger, config.password).get()
+        BackupCreator(logger=self.logger, metrics=self.metrics).prune_local(
+            local_backup_path=config.local_backup_path,
+            jobs=config.jobs,
+            password=password,
+            force=args.force,
+        )
+
+        self.logger.info(f"Done!")
+
+    def verify(self, args: Namespace) -> None:
+        from batchup.backup.backup_creator import BackupCreator
+        from batchup.password_source import PasswordSource
+
+        self.logger.info(f"Running verify...")
+        config_path: str = args.config
+        if not os.path.isfile(config_path):
+            self.logger.error(f"Configuration does not exist: {config_path}")
+            exit(1)
+
+        config = self._load_config(config_path)
+        password = PasswordSource(self.logger, config.password).get()
+        BackupCreator(logger=self.logger, metrics=self.metrics).verify_local(
+            local_backup_path=config.local_backup_path,
+            password=password,
+            slices=args.slices or config.verify_slices,
+            max_verify_jobs=config.max_verify_jobs,
+        )
+
         self.logger.info(f"Done!")
 
     def pull(self, args: Namespace) -> None:
+        from batchup.backup.backup_creator import BackupCreator
+
         self.logger.info(f"Running pull...")
         config_path: str = args.config
         if not os.path.isfile(config_path):
             self.logger.error(f"Configuration does not exist: {config_path}")
             exit(1)
 
-        config = Config(config_path)
+        config = self._load_config(config_path)
         local_backup_path = config.local_backup_path
-        local_backup_name = config.local_backup_name
+        # Every repository this host writes itself, not just the default one.
+        local_repository_names = {config.local_backup_name} | {
+            job.repository_name for job in config.jobs
+        }
         remote_backup_paths = config.remote_backup_paths
 
         self.logger.info(f"Pulling remote repositories to: {config.local_backup_path}")
@@ -74,47 +200,128 @@ class Commands:
         for backup_path in remote_backup_paths:
             self.logger.info(f"\t{backup_path}")
 
-        backup_creator = BackupCreator(logger=self.logger)
+        host_health = self._probe_hosts(config)
+        backup_creator = BackupCreator(
+            logger=self.logger,
+            host_health=host_health,
+            sync_mode=config.sync_mode,
+            transfer_profiles=config.transfer_profiles,
+            metrics=self.metrics,
+            transfer_order=config.transfer_order,
+            transfer_retries=config.transfer_retries,
+            transfer_retry_delay=config.transfer_retry_delay,
+        )
         backup_creator.pull_remote_repositories(
             local_backup_path=local_backup_path,
-            local_backup_name=local_backup_name,
+            local_repository_names=local_repository_names,
             remote_backup_paths=remote_backup_paths,
+            max_transfers=config.max_transfers,
+            max_transfers_per_host=config.max_transfers_per_host,
+            resume=args.resume,
+            plan=args.plan,
         )
 
         self.logger.info(f"Done!")
 
     def push(self, args: Namespace) -> None:
+        from batchup.backup.backup_creator import BackupCreator
+
         self.logger.info(f"Running push...")
         config_path: str = args.config
         if not os.path.isfile(config_path):
             self.logger.error(f"Configuration does not exist: {config_path}")
             exit(1)
 
-        config = Config(config_path)
+        config = self._load_config(config_path)
         local_backup_path = config.local_backup_path
         remote_backup_paths = config.remote_backup_paths
 
         self.logger.info(f"Pushing local repositories: {config.local_backup_path}")
-        backup_creator = BackupCreator(logger=self.logger)
+        host_health = self._probe_hosts(config)
+        backup_creator = BackupCreator(
+            logger=self.logger,
+            host_health=host_health,
+            sync_mode=config.sync_mode,
+            transfer_profiles=config.transfer_profiles,
+            metrics=self.metrics,
+            transfer_order=config.transfer_order,
+            transfer_retries=config.transfer_retries,
+            transfer_retry_delay=config.transfer_retry_delay,
+        )
         backup_creator.push_local_repositories(
             local_backup_path=local_backup_path,
             remote_backup_paths=remote_backup_paths,
+            max_transfers=config.max_transfers,
+            max_transfers_per_host=config.max_transfers_per_host,
+            resume=args.resume,
+            plan=args.plan,
         )
 
         self.logger.info(f"Done!")
 
     def remote(self, args: Namespace) -> None:
+        from batchup.backup.remote_backup import RemoteBackup
+
         self.logger.info(f"Running remote backup...")
         config_path: str = args.config
         if not os.path.isfile(config_path):
             self.logger.error(f"Configuration does not exist: {config_path}")
             exit(1)
 
-        config = Config(config_path)
-        RemoteBackup(logger=self.logger).run(config)
+        config = self._load_config(config_path)
+        host_health = self._probe_hosts(config)
+        remote_backup = RemoteBackup(
+            logger=self.logger,
+            host_health=host_health,
+            max_concurrency=config.remote_concurrency,
+            timeout=config.remote_timeout,
+            bootstrap=config.remote_bootstrap,
+        )
+        if not remote_backup.run(config):
+            exit(1)
 
         self.logger.info(f"Done!")
 
+    def status(self, args: Namespace) -> None:
+        from batchup.status import Status
+
+        Status(self.logger).print()
+
+    def _load_config(self, config_path: str) -> Config:
+        from batchup.config import Config
+        from batchup.process import Process
+        from batchup.resource_policy import AdaptiveThrottle
+        from batchup.ssh import Ssh
+
+        with self.metrics.phase("config"):
+            try:
+                config = Config(config_path)
+            except ValueError as e:
+                self.logger.error(f"Invalid configuration '{config_path}': {e}")
+                exit(1)
+        throttle = None
+        if config.adaptive_throttle is not None:
+            throttle = AdaptiveThrottle.from_config(config.adaptive_throttle)
+        Process.configure(
+            logger=self.logger,
+            policies=config.resource_policies,
+            max_processes=config.max_processes,
+            throttle=throttle,
+        )
+        Ssh.configure(connect_timeout=config.probe_timeout)
+        return config
+
+    def _probe_hosts(self, config: Config) -> HostHealth:
+        from batchup.host_health import HostHealth
+
+        host_health = HostHealth(
+            logger=self.logger,
+            timeout=config.probe_timeout,
+            cache_ttl=config.probe_cache_ttl,
+        )
+        host_health.probe(config.remote_backup_paths)
+        return host_health
+
     def parse_commands(self) -> None:
         home_dir = os.path.expanduser("~")
         dir_path = os.path.join(home_dir, ".config", "batchup")
@@ -124,6 +331,12 @@ class Commands:
         main_parser.add_argument(
             "-c", "--config", default=default_config_path, help="Path to config file"
         )
+        main_parser.add_argument(
+            "--profile",
+            metavar="TRACE_PATH",
+            help="Write a Chrome trace of the run stages to this path",
+        )
+        main_parser.set_defaults(record=True, plan=False)
         parser = argparse.ArgumentParser(
             description="A toolset for GNU/Linux",
             formatter_class=argparse.ArgumentDefaultsHelpFormatter,
@@ -133,22 +346,109 @@ class Commands:
         backup_parser = subparsers.add_parser(
             "backup", parents=[main_parser], help="Run the backup routine"
         )
-        backup_parser.set_defaults(func=self.backup)
+        backup_parser.add_argument(
+            "--replicate",
+            action="store_true",
+            help="Sync the repositories written by this backup to every remote",
+        )
+        backup_parser.add_argument(
+            "--plan",
+            action="store_true",
+            help="Estimate the data to move and the duration without running it",
+        )
+        backup_parser.set_defaults(func=self.backup, tools=["restic"])
+
+        watch_parser = subparsers.add_parser(
+            "watch", parents=[main_parser], help="Back up changed paths continuously"
+        )
+        watch_parser.set_defaults(func=self.watch, tools=["restic"])
+
+        prune_parser = subparsers.add_parser(
+            "prune", parents=[main_parser], help="Prune local repositories when due"
+        )
+        prune_parser.add_argument(
+            "--force", action="store_true", help="Prune regardless of thresholds"
+        )
+        prune_parser.set_defaults(func=self.prune, tools=["restic"])
+
+        verify_parser = subparsers.add_parser(
+            "verify", parents=[main_parser], help="Check local repositories"
+        )
+        verify_parser.add_argument(
+            "--slices",
+            type=int,
+            help="Read 1/SLICES of the pack data per run (1 reads everything)",
+        )
+        verify_parser.set_defaults(func=self.verify, tools=["restic"])
 
         pull_parser = subparsers.add_parser(
             "pull", parents=[main_parser], help="Pull remote repositories"
         )
-        pull_parser.set_defaults(func=self.pull)
+        pull_parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue the unfinished transfers of the last pull",
+        )
+        pull_parser.add_argument(
+            "--plan",
+            action="store_true",
+            help="Estimate the data to move and the duration without running it",
+        )
+        pull_parser.set_defaults(func=self.pull, tools=["rsync", "ssh"])
 
         push_parser = subparsers.add_parser(
             "push", parents=[main_parser], help="Push to remote repositories"
         )
-        push_parser.set_defaults(func=self.push)
+        push_parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue the unfinished transfers of the last push",
+        )
+        push_parser.add_argument(
+            "--plan",
+            action="store_true",
+            help="Estimate the data to move and the duration without running it",
+        )
+        push_parser.set_defaults(func=self.push, tools=["rsync", "ssh"])
 
         remote_parser = subparsers.add_parser(
             "remote", parents=[main_parser], help="Remote backup"
         )
-        remote_parser.set_defaults(func=self.remote)
+        remote_parser.set_defaults(func=self.remote, tools=["ssh"])
+
+        status_parser = subparsers.add_parser(
+            "status", parents=[main_parser], help="Show the state of the last runs"
+        )
+        # Reading the state must not show up as the last run.
+        status_parser.set_defaults(func=self.status, tools=[], record=False)
 
         args = parser.parse_args()
-        args.func(args)
+        # Only the tools the selected command runs have to be installed.
+        init = Init(self.logger)
+        init.check_requirements(args.tools)
+        if args.tools and args.config == default_config_path:
+            init.prepare_config()
+
+        from batchup.metrics import RunMetrics
+
+        self.metrics = RunMetrics(command=args.command)
+        if args.profile:
+            Tracer.enable()
+        status = "failed"
+        try:
+            with Tracer.span(args.command):
+                args.func(args)
+            status = "ok"
+        except SystemExit as e:
+            if not e.code:
+                status = "ok"
+            raise
+        finally:
+            self.logger.clear_status()
+            # A plan is not a run, so it stays out of the history it predicts from.
+            if args.record and not args.plan:
+                self.metrics.status = status
+                self.metrics.save()
+            if args.profile:
+                Tracer.export(args.profile)
+                self.logger.info(f"Wrote trace to: {args.profile}")
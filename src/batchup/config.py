@@ -1,6 +1,46 @@
-import glob
 import json
-import os
+from dataclasses import dataclass, field
+from functools import cached_property
+
+from batchup.backup.prune_policy import PrunePolicy
+from batchup.backup.transfer_profile import TransferProfile
+from batchup.exclude_index import ExcludeIndex
+from batchup.exclude_matcher import ExcludeMatcher
+from batchup.password_source import PasswordConfig
+
+
+@dataclass
+class BackupJob:
+    name: str
+    repository_name: str
+    includes: list[str]
+    excludes: list[str]
+    exclude_templates: list[str]
+    read_concurrency: int | None = None
+    pack_size: int | None = None
+    retention: dict[str, str] | None = None
+    prune_policy: PrunePolicy = field(default_factory=PrunePolicy)
+    exclude_mode: str = "expand"
+    use_exclude_index: bool = True
+
+    def get_exclude_paths(self) -> list[str]:
+        if self.exclude_mode == "native":
+            return self.get_exclude_patterns()
+
+        matcher = self.get_exclude_matcher()
+        index = None
+        if self.use_exclude_index:
+            index = ExcludeIndex(self.exclude_templates, self.excludes)
+        return self.excludes + matcher.match(self.includes, index)
+
+    def get_exclude_patterns(self) -> list[str]:
+        matcher = self.get_exclude_matcher()
+        return self.excludes + matcher.to_restic_patterns(self.includes)
+
+    def get_exclude_matcher(self) -> ExcludeMatcher:
+        return ExcludeMatcher(
+            exclude_templates=self.exclude_templates, excludes=self.excludes
+        )
 
 
 class Config:
@@ -10,11 +50,36 @@ class Config:
     includes: list[str]
     excludes: list[str]
     exclude_templates: list[str]
-    matched_excludes: list[str]
+    exclude_mode: str
+    use_exclude_index: bool
+    max_transfers: int
+    max_transfers_per_host: int
+    sync_mode: str
+    transfer_order: str
+    transfer_retries: int
+    transfer_retry_delay: float
+    transfer_profiles: dict[str, TransferProfile | None]
+    probe_timeout: int
+    probe_cache_ttl: int
+    max_backup_jobs: int
+    remote_concurrency: int
+    remote_timeout: float | None
+    remote_bootstrap: str
+    list_snapshots: int
+    watch_debounce: float
+    watch_min_interval: float
+    password: PasswordConfig
+    create_repository: str
+    verify_slices: int
+    max_verify_jobs: int
+    resource_policies: dict[str, dict]
+    max_processes: int | None
+    adaptive_throttle: dict | None
 
     def __init__(self, config_path: str) -> None:
         with open(config_path) as f:
             json_dict = json.load(fp=f)
+        self._json_dict = json_dict
 
         self.local_backup_path = json_dict["local-backup-path"]
         self.local_backup_name = json_dict["local-backup-name"]
@@ -23,16 +88,71 @@ class Config:
         self.excludes = json_dict.get("excludes", [])
         self.exclude_templates = json_dict.get("exclude-templates", [])
 
-        self.matched_excludes = []
-        for include_path in self.includes:
-            for exclude_template in self.exclude_templates:
-                matches = glob.glob(
-                    pathname=exclude_template,
-                    root_dir=include_path,
-                    recursive=True,
-                )
-
-                for match in matches:
-                    abs_match = os.path.join(include_path, match)
-                    if not any(exclude in abs_match for exclude in self.excludes):
-                        self.matched_excludes.append(abs_match)
+        self.exclude_mode = json_dict.get("exclude-mode", "expand")
+        self.use_exclude_index = json_dict.get("exclude-index", True)
+        self.max_transfers = json_dict.get("max-transfers", 4)
+        self.max_transfers_per_host = json_dict.get("max-transfers-per-host", 1)
+        self.sync_mode = json_dict.get("sync-mode", "manifest")
+        self.transfer_order = json_dict.get("transfer-order", "largest-first")
+        self.transfer_retries = json_dict.get("transfer-retries", 2)
+        self.transfer_retry_delay = json_dict.get("transfer-retry-delay", 5)
+        self.transfer_profiles = TransferProfile.parse_profiles(
+            json_dict.get("transfer-profiles", {})
+        )
+        self.probe_timeout = json_dict.get("probe-timeout", 5)
+        self.probe_cache_ttl = json_dict.get("probe-cache-ttl", 60)
+        self.max_backup_jobs = json_dict.get("max-backup-jobs", 2)
+        self.remote_concurrency = json_dict.get("remote-concurrency", 1)
+        self.remote_timeout = json_dict.get("remote-timeout")
+        self.remote_bootstrap = json_dict.get("remote-bootstrap", "artifact")
+        self.list_snapshots = json_dict.get("list-snapshots", 5)
+        self.watch_debounce = json_dict.get("watch-debounce", 10)
+        self.watch_min_interval = json_dict.get("watch-min-interval", 300)
+        self.password = json_dict.get("password", {})
+        self.create_repository = json_dict.get("create-repository", "ask")
+        self.verify_slices = json_dict.get("verify-slices", 30)
+        self.max_verify_jobs = json_dict.get("max-verify-jobs", 2)
+        self.resource_policies = json_dict.get("resource-policies", {})
+        self.max_processes = json_dict.get("max-processes")
+        self.adaptive_throttle = json_dict.get("adaptive-throttle")
+
+    # Jobs are only parsed by the commands that back up or prune.
+    @cached_property
+    def jobs(self) -> list[BackupJob]:
+        json_dict = self._json_dict
+        if "jobs" in json_dict:
+            return [self._parse_job(job, json_dict) for job in json_dict["jobs"]]
+        return [
+            BackupJob(
+                name=self.local_backup_name,
+                repository_name=self.local_backup_name,
+                includes=self.includes,
+                excludes=self.excludes,
+                exclude_templates=self.exclude_templates,
+                read_concurrency=json_dict.get("read-concurrency"),
+                pack_size=json_dict.get("pack-size"),
+                retention=json_dict.get("retention"),
+                prune_policy=PrunePolicy.from_config(json_dict.get("prune", {})),
+                exclude_mode=self.exclude_mode,
+                use_exclude_index=self.use_exclude_index,
+            )
+        ]
+
+    def _parse_job(self, job_dict: dict, json_dict: dict) -> BackupJob:
+        name = job_dict["name"]
+        prune_policy = {**json_dict.get("prune", {}), **job_dict.get("prune", {})}
+        return BackupJob(
+            name=name,
+            repository_name=job_dict.get("repository", name),
+            includes=job_dict.get("includes", []),
+            excludes=job_dict.get("excludes", self.excludes),
+            exclude_templates=job_dict.get(
+                "exclude-templates", self.exclude_templates
+            ),
+            read_concurrency=job_dict.get("read-concurrency"),
+            pack_size=job_dict.get("pack-size"),
+            retention=job_dict.get("retention", json_dict.get("retention")),
+            prune_policy=PrunePolicy.from_config(prune_policy),
+            exclude_mode=job_dict.get("exclude-mode", self.exclude_mode),
+            use_exclude_index=self.use_exclude_index,
+        )
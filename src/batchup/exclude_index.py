@@ -0,0 +1,31 @@
+import hashlib
+import json
+import os
+
+from batchup.utils import Utils
+
+
+class ExcludeIndex:
+    INDEX_DIR_NAME = "exclude-index"
+    VERSION = 2
+
+    def __init__(self, exclude_templates: list[str], excludes: list[str]) -> None:
+        self.exclude_templates = exclude_templates
+        self.excludes = excludes
+
+    def load(self, include_path: str) -> dict[str, dict]:
+        index = Utils.load_json_state(self._get_index_path(include_path))
+        return index.get("directories", {})
+
+    def save(self, include_path: str, directories: dict[str, dict]) -> None:
+        Utils.save_json_state(
+            self._get_index_path(include_path),
+            {"include": include_path, "directories": directories},
+        )
+
+    def _get_index_path(self, include_path: str) -> str:
+        key = json.dumps(
+            [self.VERSION, include_path, self.exclude_templates, self.excludes]
+        )
+        digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+        return Utils.get_cache_path(os.path.join(self.INDEX_DIR_NAME, f"{digest}.json"))
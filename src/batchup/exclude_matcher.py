@@ -0,0 +1,150 @@
+import os
+import re
+import time
+
+from batchup.exclude_index import ExcludeIndex
+
+
+class ExcludeMatcher:
+    MTIME_SETTLE_NS = 2_000_000_000
+
+    def __init__(self, exclude_templates: list[str], excludes: list[str]) -> None:
+        self.exclude_templates = exclude_templates
+        self.excludes = excludes
+        self.pattern = self._compile(exclude_templates)
+
+    def match(
+        self, include_paths: list[str], index: ExcludeIndex | None = None
+    ) -> list[str]:
+        matches: list[str] = []
+        for include_path in include_paths:
+            matches.extend(self.match_root(include_path, index))
+        return matches
+
+    def match_root(
+        self, include_path: str, index: ExcludeIndex | None = None
+    ) -> list[str]:
+        matches: list[str] = []
+        pattern = self.pattern
+        if pattern is None or not os.path.isdir(include_path):
+            return matches
+
+        cached = index.load(include_path) if index is not None else {}
+        directories: dict[str, dict] = {}
+        scan_time = time.time_ns()
+        stack = [(include_path, "")]
+        while stack:
+            dir_path, rel_dir = stack.pop()
+            try:
+                mtime = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                continue
+
+            # A directory's entry list only changes together with its mtime.
+            entry = cached.get(rel_dir)
+            if entry is None or entry["mtime"] != mtime:
+                try:
+                    entry = self._scan_directory(dir_path, rel_dir, pattern)
+                except OSError:
+                    continue
+                # Changes within the mtime granularity would go unnoticed, so
+                # directories modified just now are rescanned next time.
+                is_settled = scan_time - mtime > self.MTIME_SETTLE_NS
+                entry["mtime"] = mtime if is_settled else None
+            directories[rel_dir] = entry
+
+            for name in entry["matches"]:
+                matches.append(os.path.join(dir_path, name))
+            for name in entry["dirs"]:
+                stack.append((os.path.join(dir_path, name), f"{rel_dir}{name}/"))
+
+        if index is not None:
+            index.save(include_path, directories)
+        return matches
+
+    def _scan_directory(
+        self, dir_path: str, rel_dir: str, pattern: re.Pattern[str]
+    ) -> dict:
+        matched_names = []
+        dir_names = []
+        for entry in os.scandir(dir_path):
+            if self.is_explicitly_excluded(entry.path):
+                continue
+            if pattern.fullmatch(f"{rel_dir}{entry.name}"):
+                matched_names.append(entry.name)
+            elif entry.is_dir(follow_symlinks=False):
+                dir_names.append(entry.name)
+        return {"matches": matched_names, "dirs": dir_names}
+
+    def to_restic_patterns(self, include_paths: list[str]) -> list[str]:
+        patterns = []
+        for include_path in include_paths:
+            for exclude_template in self.exclude_templates:
+                pattern = exclude_template.lstrip("/").replace("[!", "[^")
+                patterns.append(f"{include_path.rstrip('/')}/{pattern}")
+        return patterns
+
+    def is_excluded(self, include_path: str, path: str) -> bool:
+        if self.is_explicitly_excluded(path):
+            return True
+        if self.pattern is None:
+            return False
+        rel_path = os.path.relpath(path, include_path)
+        return self.pattern.fullmatch(rel_path) is not None
+
+    def is_explicitly_excluded(self, path: str) -> bool:
+        return any(exclude in path for exclude in self.excludes)
+
+    @staticmethod
+    def _compile(exclude_templates: list[str]) -> re.Pattern[str] | None:
+        if not exclude_templates:
+            return None
+        regexes = [
+            ExcludeMatcher._translate(template) for template in exclude_templates
+        ]
+        return re.compile("|".join(f"(?:{regex})" for regex in regexes))
+
+    @staticmethod
+    def _translate(exclude_template: str) -> str:
+        # Like glob, wildcards never match a leading dot: hidden names are only
+        # matched by a segment that starts with a literal ".".
+        visible = r"(?!\.)[^/]+"
+        parts = []
+        segments = [s for s in exclude_template.strip("/").split("/") if s]
+        for index, segment in enumerate(segments):
+            is_last = index == len(segments) - 1
+            if segment == "**":
+                if not is_last:
+                    parts.append(f"(?:{visible}/)*")
+                elif parts and segments[index - 1] != "**":
+                    # "dir/**" matches the directory itself too, as glob does.
+                    parts[-1] = parts[-1][:-1]
+                    parts.append(f"(?:/{visible})*")
+                else:
+                    parts.append(f"{visible}(?:/{visible})*")
+                continue
+            regex = ExcludeMatcher._translate_segment(segment)
+            parts.append(regex if is_last else f"{regex}/")
+        return "".join(parts)
+
+    @staticmethod
+    def _translate_segment(segment: str) -> str:
+        regex = "" if segment.startswith(".") else r"(?!\.)"
+        index = 0
+        while index < len(segment):
+            char = segment[index]
+            index += 1
+            if char == "*":
+                regex += "[^/]*"
+            elif char == "?":
+                regex += "[^/]"
+            elif char == "[" and "]" in segment[index + 1 :]:
+                end = segment.index("]", index + 1)
+                char_class = segment[index:end]
+                if char_class.startswith("!"):
+                    char_class = "^" + char_class[1:]
+                regex += "[" + char_class.replace("\\", "\\\\") + "]"
+                index = end + 1
+            else:
+                regex += re.escape(char)
+        return regex
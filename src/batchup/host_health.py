@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from batchup.logger import SimpleLogger
+from batchup.tracing import Tracer
+from batchup.utils import Utils
+
+
+class HostHealth:
+    CACHE_FILE_NAME = "host_health.json"
+
+    def __init__(self, logger: SimpleLogger, timeout: int, cache_ttl: int) -> None:
+        self.logger = logger
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache_path = Utils.get_cache_path(self.CACHE_FILE_NAME)
+        self.status: dict[str, bool] = {}
+
+    def probe(self, remote_backup_paths: list[str]) -> None:
+        remote_servers = sorted(
+            {Utils.get_server_from_path(path) for path in remote_backup_paths}
+        )
+        cache = self._load_cache()
+        now = time.time()
+        for remote_server in remote_servers:
+            entry = cache.get(remote_server)
+            if entry and now - entry["time"] < self.cache_ttl:
+                self.status[remote_server] = entry["up"]
+
+        to_probe = [host for host in remote_servers if host not in self.status]
+        if to_probe:
+            self.logger.info(f"Probing {len(to_probe)} host(s)...")
+            with Tracer.span("probe-hosts"), ThreadPoolExecutor(
+                max_workers=len(to_probe)
+            ) as executor:
+                results = executor.map(
+                    lambda host: Utils.check_ssh_connection(host, self.timeout),
+                    to_probe,
+                )
+                for remote_server, is_up in zip(to_probe, results):
+                    self.status[remote_server] = is_up
+                    cache[remote_server] = {"up": is_up, "time": now}
+            self._save_cache(cache)
+
+        for remote_server in remote_servers:
+            if not self.status[remote_server]:
+                self.logger.warning(f"Host is unreachable: '{remote_server}'")
+
+    def is_up(self, remote_server: str) -> bool:
+        if remote_server not in self.status:
+            self.status[remote_server] = Utils.check_ssh_connection(
+                remote_server, self.timeout
+            )
+        return self.status[remote_server]
+
+    def _load_cache(self) -> dict[str, dict]:
+        if self.cache_ttl <= 0:
+            return {}
+        return Utils.load_json_state(self.cache_path)
+
+    def _save_cache(self, cache: dict[str, dict]) -> None:
+        if self.cache_ttl <= 0:
+            return
+        Utils.save_json_state(self.cache_path, cache)
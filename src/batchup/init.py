@@ -27,10 +27,8 @@ class Init:
     def __init__(self, logger: SimpleLogger) -> None:
         self.logger = logger
 
-    def check_requirements(self) -> None:
-        REQUIRED_COMMANDS = ["restic", "rsync"]
-
-        for command in REQUIRED_COMMANDS:
+    def check_requirements(self, commands: list[str]) -> None:
+        for command in commands:
             if not shutil.which(command):
                 self.logger.error(f"The tool requires '{command}' to be installed")
                 exit(1)
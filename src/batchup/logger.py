@@ -1,4 +1,6 @@
 import logging
+import shutil
+import sys
 from typing import Any
 
 
@@ -20,6 +22,7 @@ class SimpleLogger:
         if not self.logger.handlers:
             self.logger.addHandler(handler)
         self.logger.propagate = False
+        self.has_status = False
 
     def set_level(self, level: str) -> None:
         self.logger.setLevel(getattr(logging, level.upper(), logging.INFO))
@@ -32,21 +35,42 @@ class SimpleLogger:
             return f"{level} {record.getMessage()}"
 
     def write(self, msg: str, *args: Any, **kwargs: Any) -> None:
+        self.clear_status()
         if args or kwargs:
             msg = msg.format(*args, **kwargs)
         print(f"{msg}")
 
+    def status(self, msg: str) -> None:
+        if not sys.stderr.isatty():
+            return
+        columns = shutil.get_terminal_size().columns
+        sys.stderr.write(f"\r\033[K{msg[: columns - 1]}")
+        sys.stderr.flush()
+        self.has_status = True
+
+    def clear_status(self) -> None:
+        if self.has_status:
+            sys.stderr.write("\r\033[K")
+            sys.stderr.flush()
+            self.has_status = False
+
     def debug(self, msg: str, *args: Any, **kwargs: Any) -> None:
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.clear_status()
         self.logger.debug(msg, *args, **kwargs)
 
     def info(self, msg: str, *args: Any, **kwargs: Any) -> None:
+        self.clear_status()
         self.logger.info(msg, *args, **kwargs)
 
     def warning(self, msg: str, *args: Any, **kwargs: Any) -> None:
+        self.clear_status()
         self.logger.warning(msg, *args, **kwargs)
 
     def error(self, msg: str, *args: Any, **kwargs: Any) -> None:
+        self.clear_status()
         self.logger.error(msg, *args, **kwargs)
 
     def critical(self, msg: str, *args: Any, **kwargs: Any) -> None:
+        self.clear_status()
         self.logger.critical(msg, *args, **kwargs)
@@ -1,5 +1,4 @@
 from batchup.commands import Commands
-from batchup.init import Init
 from batchup.logger import SimpleLogger
 
 
@@ -7,9 +6,6 @@ logger = SimpleLogger(level="INFO")
 
 
 def main() -> None:
-    init = Init(logger)
-    init.check_requirements()
-    init.prepare_config()
     Commands(logger).parse_commands()
 
 
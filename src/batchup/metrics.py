@@ -0,0 +1,191 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator
+
+from batchup.logger import SimpleLogger
+from batchup.tracing import Tracer
+from batchup.utils import Utils
+
+
+@dataclass
+class BackupMetrics:
+    repository: str
+    percent_done: float = 0.0
+    files_done: int = 0
+    total_files: int = 0
+    bytes_done: int = 0
+    total_bytes: int = 0
+    files_new: int = 0
+    files_changed: int = 0
+    data_added: int = 0
+    total_bytes_processed: int = 0
+    snapshot_id: str = ""
+    duration: float = 0.0
+    finished: bool = False
+
+    def update(self, message: dict) -> None:
+        message_type = message.get("message_type")
+        if message_type == "status":
+            self.percent_done = message.get("percent_done", 0.0)
+            self.files_done = message.get("files_done", 0)
+            self.total_files = message.get("total_files", 0)
+            self.bytes_done = message.get("bytes_done", 0)
+            self.total_bytes = message.get("total_bytes", 0)
+            self.duration = message.get("seconds_elapsed", self.duration)
+        elif message_type == "summary":
+            self.files_new = message.get("files_new", 0)
+            self.files_changed = message.get("files_changed", 0)
+            self.data_added = message.get("data_added", 0)
+            self.total_bytes_processed = message.get("total_bytes_processed", 0)
+            self.files_done = message.get("total_files_processed", self.files_done)
+            self.snapshot_id = message.get("snapshot_id", "")
+            self.duration = message.get("total_duration", self.duration)
+            self.percent_done = 1.0
+            self.finished = True
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files_done / self.duration if self.duration else 0.0
+
+    @property
+    def dedup_ratio(self) -> float:
+        processed = self.total_bytes_processed or self.bytes_done
+        return processed / self.data_added if self.data_added else 0.0
+
+    def status(self) -> str:
+        return (
+            f"{os.path.basename(self.repository)} {self.percent_done:.0%} "
+            f"{Utils.format_size(self.bytes_done)} "
+            f"{self.files_per_second:.0f} files/s"
+        )
+
+
+@dataclass
+class TransferMetrics:
+    source: str
+    destination: str
+    bytes_done: int = 0
+    percent_done: float = 0.0
+    rate: str = ""
+    bytes_transferred: int = 0
+    files_transferred: int = 0
+    duration: float = 0.0
+    finished: bool = False
+
+    PROGRESS_LINE = re.compile(r"^\s*([\d,]+)\s+(\d+)%\s+(\S+/s)")
+    STATS_LINE = re.compile(r"^([A-Za-z ]+): ([\d,]+)")
+
+    def update(self, line: str) -> bool:
+        progress = self.PROGRESS_LINE.match(line)
+        if progress:
+            self.bytes_done = int(progress.group(1).replace(",", ""))
+            self.percent_done = int(progress.group(2)) / 100
+            self.rate = progress.group(3)
+            return True
+
+        stats = self.STATS_LINE.match(line)
+        if stats:
+            value = int(stats.group(2).replace(",", ""))
+            if stats.group(1) == "Total transferred file size":
+                self.bytes_transferred += value
+            elif stats.group(1) == "Number of regular files transferred":
+                self.files_transferred += value
+        return False
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_transferred / self.duration if self.duration else 0.0
+
+    def status(self) -> str:
+        return (
+            f"{os.path.basename(self.source.rstrip('/'))} {self.percent_done:.0%} "
+            f"{self.rate}"
+        )
+
+
+@dataclass
+class RunMetrics:
+    command: str
+    start_time: float = field(default_factory=time.time)
+    phases: dict[str, float] = field(default_factory=dict)
+    backups: list[BackupMetrics] = field(default_factory=list)
+    transfers: list[TransferMetrics] = field(default_factory=list)
+    status: str = "failed"
+
+    METRICS_FILE_NAME = "metrics.jsonl"
+    STATUS_INTERVAL = 0.5
+
+    def __post_init__(self) -> None:
+        self.lock = threading.Lock()
+        self.last_status_time = 0.0
+
+    def add_backup(self, repository: str) -> BackupMetrics:
+        backup_metrics = BackupMetrics(repository=repository)
+        with self.lock:
+            self.backups.append(backup_metrics)
+        return backup_metrics
+
+    def add_transfer(self, source: str, destination: str) -> TransferMetrics:
+        transfer_metrics = TransferMetrics(source=source, destination=destination)
+        with self.lock:
+            self.transfers.append(transfer_metrics)
+        return transfer_metrics
+
+    @contextmanager
+    def phase(self, name: str, **args: Any) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            with Tracer.span(name, **args):
+                yield
+        finally:
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + (
+                    time.monotonic() - start
+                )
+
+    def report_status(self, logger: SimpleLogger, force: bool = False) -> None:
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.last_status_time < self.STATUS_INTERVAL:
+                return
+            self.last_status_time = now
+            active = [m for m in self.backups + self.transfers if not m.finished]
+            status = " | ".join(metrics.status() for metrics in active)
+        if status:
+            logger.status(status)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "command": self.command,
+                "start-time": self.start_time,
+                "duration": time.time() - self.start_time,
+                "status": self.status,
+                "phases": dict(self.phases),
+                "backups": [
+                    {
+                        **asdict(metrics),
+                        "files-per-second": metrics.files_per_second,
+                        "dedup-ratio": metrics.dedup_ratio,
+                    }
+                    for metrics in self.backups
+                ],
+                "transfers": [
+                    {
+                        **asdict(metrics),
+                        "bytes-per-second": metrics.bytes_per_second,
+                    }
+                    for metrics in self.transfers
+                ],
+            }
+
+    def save(self) -> None:
+        metrics_path = Utils.get_state_path(self.METRICS_FILE_NAME)
+        os.makedirs(os.path.dirname(metrics_path), exist_ok=True)
+        with open(metrics_path, "a") as f:
+            f.write(json.dumps(self.to_dict()) + "\n")
@@ -0,0 +1,93 @@
+import getpass
+import importlib
+import os
+import shlex
+import stat
+import subprocess
+from typing import NoReturn, TypedDict
+
+from batchup.logger import SimpleLogger
+
+
+class PasswordConfig(TypedDict, total=False):
+    file: str
+    command: str | list[str]
+    keyring: dict[str, str]
+
+
+class PasswordSource:
+
+    def __init__(self, logger: SimpleLogger, source: PasswordConfig) -> None:
+        self.logger = logger
+        self.source = source
+
+    def get(self) -> str:
+        if "file" in self.source:
+            file_path = self.source["file"]
+            if not isinstance(file_path, str):
+                self._invalid("file", "a path")
+            return self._read_file(os.path.expanduser(file_path))
+        if "command" in self.source:
+            command = self.source["command"]
+            if not isinstance(command, (str, list)):
+                self._invalid("command", "a string or a list")
+            return self._run_command(command)
+        if "keyring" in self.source:
+            entry = self.source["keyring"]
+            if not isinstance(entry, dict) or "username" not in entry:
+                self._invalid("keyring", "an object with a username")
+            return self._read_keyring(entry)
+        try:
+            return getpass.getpass(prompt="Input password: ")
+        except EOFError:
+            self.logger.error("No password source configured and no password given.")
+            exit(1)
+
+    def _read_file(self, file_path: str) -> str:
+        try:
+            with open(file_path) as f:
+                mode = os.fstat(f.fileno()).st_mode
+                password = f.read().rstrip("\n")
+        except OSError as e:
+            self.logger.error(f"Failed to read password file: {e}")
+            exit(1)
+        if mode & (stat.S_IRWXG | stat.S_IRWXO):
+            self.logger.warning(
+                f"Password file is accessible by other users: {file_path}"
+            )
+        return password
+
+    def _run_command(self, command: str | list[str]) -> str:
+        cmd = shlex.split(command) if isinstance(command, str) else command
+        try:
+            result = subprocess.run(
+                cmd, stdin=subprocess.DEVNULL, capture_output=True, text=True
+            )
+        except OSError as e:
+            self.logger.error(f"Failed to run password command: {e}")
+            exit(1)
+        if result.returncode != 0:
+            self.logger.error(
+                f"Password command exited with {result.returncode}: "
+                f"{result.stderr.strip()}"
+            )
+            exit(1)
+        return result.stdout.rstrip("\n")
+
+    def _read_keyring(self, entry: dict[str, str]) -> str:
+        try:
+            keyring = importlib.import_module("keyring")
+        except ImportError:
+            self.logger.error("Keyring passwords require the 'keyring' package.")
+            exit(1)
+        password = keyring.get_password(
+            entry.get("service", "batchup"), entry["username"]
+        )
+        if password is None:
+            self.logger.error(f"No keyring password for: {entry['username']}")
+            exit(1)
+        return password
+
+    def _invalid(self, key: str, expected: str) -> NoReturn:
+        self.logger.error(f"Password '{key}' must be {expected}.")
+        exit(1)
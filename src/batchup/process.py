@@ -0,0 +1,110 @@
+import io
+import re
+import subprocess
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from batchup.logger import SimpleLogger
+from batchup.resource_policy import AdaptiveThrottle, ResourcePolicy
+from batchup.tracing import Tracer
+
+
+class Process:
+    LINE_SEPARATOR = re.compile(rb"[\r\n]")
+
+    _logger: SimpleLogger | None = None
+    _policies: dict[str, dict] = {}
+    _slots: threading.BoundedSemaphore | None = None
+    _throttle: AdaptiveThrottle | None = None
+
+    @staticmethod
+    def configure(
+        logger: SimpleLogger,
+        policies: dict[str, dict],
+        max_processes: int | None = None,
+        throttle: AdaptiveThrottle | None = None,
+    ) -> None:
+        Process._logger = logger
+        Process._policies = policies
+        Process._slots = (
+            threading.BoundedSemaphore(max(1, max_processes))
+            if max_processes is not None
+            else None
+        )
+        Process._throttle = throttle
+
+    @staticmethod
+    def policy(stage: str) -> ResourcePolicy:
+        return ResourcePolicy.from_config(
+            {**Process._policies.get("default", {}), **Process._policies.get(stage, {})}
+        )
+
+    @staticmethod
+    @contextmanager
+    def slot() -> Iterator[None]:
+        if Process._slots is not None:
+            with Tracer.span("process-slot"):
+                Process._slots.acquire()
+        try:
+            if Process._throttle is not None and Process._logger is not None:
+                with Tracer.span("throttle"):
+                    Process._throttle.wait(Process._logger)
+            yield
+        finally:
+            if Process._slots is not None:
+                Process._slots.release()
+
+    @staticmethod
+    def run(
+        cmd: list[str], stage: str, **kwargs: Any
+    ) -> subprocess.CompletedProcess:
+        with Process.slot():
+            return subprocess.run(Process.policy(stage).apply(cmd), **kwargs)
+
+    @staticmethod
+    def stream(
+        cmd: list[str], env: dict[str, str] | None = None, stage: str = "default"
+    ) -> Iterator[str]:
+        with Process.slot():
+            yield from Process._stream(Process.policy(stage).apply(cmd), env)
+
+    @staticmethod
+    def _stream(cmd: list[str], env: dict[str, str] | None) -> Iterator[str]:
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+        )
+        # Both pipes exist since they were requested; stdout is buffered for read1.
+        stdout, stderr = process.stdout, process.stderr
+        assert isinstance(stdout, io.BufferedReader) and stderr is not None
+        stderr_chunks: list[bytes] = []
+        stderr_thread = threading.Thread(
+            target=lambda: stderr_chunks.append(stderr.read()), daemon=True
+        )
+        stderr_thread.start()
+
+        try:
+            # Progress output redraws a single line with \r, so split on both.
+            buffer = b""
+            while chunk := stdout.read1(65536):
+                *lines, buffer = Process.LINE_SEPARATOR.split(buffer + chunk)
+                for line in lines:
+                    if line:
+                        yield line.decode(errors="replace")
+            if buffer:
+                yield buffer.decode(errors="replace")
+        finally:
+            stdout.close()
+            return_code = process.wait()
+            stderr_thread.join()
+
+        if return_code != 0:
+            raise subprocess.CalledProcessError(
+                return_code,
+                cmd,
+                stderr=b"".join(stderr_chunks).decode(errors="replace"),
+            )
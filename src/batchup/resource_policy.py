@@ -0,0 +1,114 @@
+import os
+import time
+from dataclasses import dataclass
+
+from batchup.logger import SimpleLogger
+
+
+@dataclass
+class ResourcePolicy:
+    nice: int | None = None
+    ionice_class: str | None = None
+    ionice_level: int | None = None
+    bwlimit: str | None = None
+    limit_upload: int | None = None
+    limit_download: int | None = None
+
+    IONICE_CLASSES = {"realtime": "1", "best-effort": "2", "idle": "3"}
+
+    def apply(self, cmd: list[str]) -> list[str]:
+        name = os.path.basename(cmd[0])
+        args = cmd[1:]
+        if name == "restic":
+            args = self.restic_args() + args
+        elif name == "rsync" and self.bwlimit:
+            # A bandwidth limit from the host's transfer profile wins.
+            if not any(arg.startswith("--bwlimit") for arg in args):
+                args = [f"--bwlimit={self.bwlimit}"] + args
+        return self.command_prefix() + [cmd[0], *args]
+
+    def command_prefix(self) -> list[str]:
+        prefix = []
+        if self.nice is not None:
+            prefix += ["nice", "-n", str(self.nice)]
+        if self.ionice_class is not None:
+            prefix += ["ionice", "-c", self.IONICE_CLASSES[self.ionice_class]]
+            if self.ionice_level is not None and self.ionice_class != "idle":
+                prefix += ["-n", str(self.ionice_level)]
+        return prefix
+
+    def restic_args(self) -> list[str]:
+        args = []
+        if self.limit_upload is not None:
+            args += ["--limit-upload", str(self.limit_upload)]
+        if self.limit_download is not None:
+            args += ["--limit-download", str(self.limit_download)]
+        return args
+
+    @staticmethod
+    def from_config(policy: dict) -> "ResourcePolicy":
+        return ResourcePolicy(
+            nice=policy.get("nice"),
+            ionice_class=policy.get("ionice-class"),
+            ionice_level=policy.get("ionice-level"),
+            bwlimit=policy.get("bwlimit"),
+            limit_upload=policy.get("limit-upload"),
+            limit_download=policy.get("limit-download"),
+        )
+
+
+@dataclass
+class AdaptiveThrottle:
+    max_load: float | None = None
+    max_io_pressure: float | None = None
+    max_wait: float = 600.0
+
+    PRESSURE_PATH = "/proc/pressure/io"
+    INITIAL_DELAY = 5.0
+    MAX_DELAY = 60.0
+
+    def wait(self, logger: SimpleLogger) -> None:
+        delay = self.INITIAL_DELAY
+        waited = 0.0
+        while waited < self.max_wait:
+            reason = self.get_pressure_reason()
+            if reason is None:
+                return
+            delay = min(delay, self.max_wait - waited)
+            logger.warning(f"Delaying next process by {delay:g}s: {reason}")
+            time.sleep(delay)
+            waited += delay
+            delay = min(delay * 2, self.MAX_DELAY)
+
+    def get_pressure_reason(self) -> str | None:
+        if self.max_load is not None:
+            load = os.getloadavg()[0] / (os.cpu_count() or 1)
+            if load > self.max_load:
+                return f"load {load:.2f} per CPU"
+        if self.max_io_pressure is not None:
+            pressure = self._read_io_pressure()
+            if pressure is not None and pressure > self.max_io_pressure:
+                return f"I/O pressure {pressure:.1f}%"
+        return None
+
+    def _read_io_pressure(self) -> float | None:
+        # "some avg10=1.23 ..." is the share of time a task waited on I/O.
+        try:
+            with open(self.PRESSURE_PATH) as f:
+                for line in f:
+                    if line.startswith("some "):
+                        fields = dict(
+                            field.split("=", 1) for field in line.split()[1:]
+                        )
+                        return float(fields["avg10"])
+        except (OSError, ValueError, KeyError):
+            return None
+        return None
+
+    @staticmethod
+    def from_config(throttle: dict) -> "AdaptiveThrottle":
+        return AdaptiveThrottle(
+            max_load=throttle.get("max-load"),
+            max_io_pressure=throttle.get("max-io-pressure"),
+            max_wait=throttle.get("max-wait", 600.0),
+        )
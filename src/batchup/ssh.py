@@ -0,0 +1,76 @@
+import atexit
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+
+
+class Ssh:
+    CONTROL_PERSIST_SECONDS = 300
+
+    _connect_timeout: int | None = None
+    _control_dir: str | None = None
+    _hosts: set[str] = set()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def configure(connect_timeout: int | None) -> None:
+        Ssh._connect_timeout = connect_timeout
+
+    @staticmethod
+    def command(remote_server: str, *args: str) -> list[str]:
+        return ["ssh", *Ssh.options(remote_server), remote_server, *args]
+
+    @staticmethod
+    def rsync_shell(remote_server: str) -> str:
+        return shlex.join(["ssh", *Ssh.options(remote_server)])
+
+    @staticmethod
+    def options(remote_server: str) -> list[str]:
+        control_dir = Ssh._register(remote_server)
+        options = [
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={control_dir}/%C",
+            "-o",
+            f"ControlPersist={Ssh.CONTROL_PERSIST_SECONDS}",
+        ]
+        if Ssh._connect_timeout is not None:
+            options += ["-o", f"ConnectTimeout={Ssh._connect_timeout}"]
+        return options
+
+    @staticmethod
+    def close_all() -> None:
+        with Ssh._lock:
+            control_dir = Ssh._control_dir
+            hosts = list(Ssh._hosts)
+            Ssh._control_dir = None
+            Ssh._hosts.clear()
+        if control_dir is None:
+            return
+
+        for remote_server in hosts:
+            subprocess.run(
+                [
+                    "ssh",
+                    "-o",
+                    f"ControlPath={control_dir}/%C",
+                    "-O",
+                    "exit",
+                    remote_server,
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        shutil.rmtree(control_dir, ignore_errors=True)
+
+    @staticmethod
+    def _register(remote_server: str) -> str:
+        with Ssh._lock:
+            if Ssh._control_dir is None:
+                Ssh._control_dir = tempfile.mkdtemp(prefix="batchup-ssh-")
+                atexit.register(Ssh.close_all)
+            Ssh._hosts.add(remote_server)
+            return Ssh._control_dir
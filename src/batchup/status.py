@@ -0,0 +1,89 @@
+import json
+import os
+import time
+
+from batchup.backup.prune_policy import PruneState
+from batchup.backup.verify_state import VerifyState
+from batchup.host_health import HostHealth
+from batchup.logger import SimpleLogger
+from batchup.metrics import RunMetrics
+from batchup.utils import Utils
+
+
+class Status:
+    METRICS_TAIL_BYTES = 256 * 1024
+
+    def __init__(self, logger: SimpleLogger) -> None:
+        self.logger = logger
+
+    def print(self) -> None:
+        now = time.time()
+        self.logger.write("Last runs:")
+        for command, run in sorted(self._get_last_runs().items()):
+            self.logger.write(
+                f"  {command:<8} {self._format_age(now - run['start-time']):>9}  "
+                f"{run.get('status', '?'):<6} {run['duration']:.1f}s"
+            )
+
+        hosts = Utils.load_json_state(
+            Utils.get_cache_path(HostHealth.CACHE_FILE_NAME)
+        )
+        if hosts:
+            self.logger.write("Hosts:")
+            for host, entry in sorted(hosts.items()):
+                state = "up" if entry["up"] else "down"
+                self.logger.write(
+                    f"  {host:<20} {state:<5} "
+                    f"probed {self._format_age(now - entry['time'])} ago"
+                )
+
+        prune_state = Utils.load_json_state(
+            Utils.get_state_path(PruneState.STATE_FILE_NAME)
+        )
+        verify_state = Utils.load_json_state(
+            Utils.get_state_path(VerifyState.STATE_FILE_NAME)
+        )
+        repositories = sorted(set(prune_state) | set(verify_state))
+        if repositories:
+            self.logger.write("Repositories:")
+        for repository in repositories:
+            line = f"  {repository}"
+            prune_entry = prune_state.get(repository)
+            if prune_entry:
+                last_prune = prune_entry.get("last-prune")
+                pruned = "never pruned"
+                if last_prune is not None:
+                    pruned = f"pruned {self._format_age(now - last_prune)} ago"
+                forgotten = prune_entry.get("forgotten-since-prune", 0)
+                line += f"  {pruned}, {forgotten} forgotten since"
+            for slices, entry in sorted(verify_state.get(repository, {}).items()):
+                line += (
+                    f"  verify 1/{slices} {entry['last-result']} "
+                    f"{self._format_age(now - entry['last-check'])} ago"
+                )
+            self.logger.write(line)
+
+    def _get_last_runs(self) -> dict[str, dict]:
+        metrics_path = Utils.get_state_path(RunMetrics.METRICS_FILE_NAME)
+        if not os.path.isfile(metrics_path):
+            return {}
+        # Only the end of the append-only log is needed for the latest runs.
+        with open(metrics_path, "rb") as f:
+            f.seek(max(0, os.path.getsize(metrics_path) - self.METRICS_TAIL_BYTES))
+            lines = f.read().splitlines()
+        runs = {}
+        for line in lines:
+            try:
+                run = json.loads(line)
+            except ValueError:
+                continue
+            if run.get("command"):
+                runs[run["command"]] = run
+        return runs
+
+    @staticmethod
+    def _format_age(seconds: float) -> str:
+        for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+            if seconds >= size:
+                return f"{seconds / size:.1f}{unit}"
+        return f"{seconds:.0f}s"
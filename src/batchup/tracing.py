@@ -0,0 +1,120 @@
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+
+class Tracer:
+    STATUS_PATH = "/proc/self/status"
+    CLEAR_REFS_PATH = "/proc/self/clear_refs"
+
+    _enabled = False
+    _events: list[dict] = []
+    _lock = threading.Lock()
+    _origin = time.perf_counter()
+    _open_peaks: dict[int, int] = {}
+    _next_token = 0
+    _span_peaks = True
+
+    @staticmethod
+    def enable() -> None:
+        with Tracer._lock:
+            Tracer._enabled = True
+            Tracer._events = []
+            Tracer._origin = time.perf_counter()
+            Tracer._open_peaks = {}
+
+    @staticmethod
+    @contextmanager
+    def span(name: str, **args: Any) -> Iterator[None]:
+        if not Tracer._enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+        token = Tracer._begin_peak()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            children_end = resource.getrusage(resource.RUSAGE_CHILDREN)
+            peak_rss = Tracer._end_peak(token)
+            # Child usage is process wide, so concurrent spans share it.
+            children_cpu = (children_end.ru_utime - children_start.ru_utime) + (
+                children_end.ru_stime - children_start.ru_stime
+            )
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": (start - Tracer._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {
+                    **args,
+                    "children-cpu-seconds": round(children_cpu, 6),
+                    "peak-rss-kib": peak_rss,
+                    "peak-rss-scope": "span" if Tracer._span_peaks else "process",
+                    # The kernel only keeps the largest child ever waited for.
+                    "largest-child-rss-kib": children_end.ru_maxrss,
+                },
+            }
+            with Tracer._lock:
+                Tracer._events.append(event)
+
+    @staticmethod
+    def _begin_peak() -> int:
+        # The kernel keeps one peak RSS per process. It is folded into every
+        # open span and reset when a span starts, so each span sees its own.
+        with Tracer._lock:
+            Tracer._next_token += 1
+            token = Tracer._next_token
+            Tracer._fold_peak()
+            if Tracer._span_peaks:
+                try:
+                    with open(Tracer.CLEAR_REFS_PATH, "w") as f:
+                        f.write("5")
+                except OSError:
+                    Tracer._span_peaks = False
+            Tracer._open_peaks[token] = Tracer._read_peak() or 0
+        return token
+
+    @staticmethod
+    def _end_peak(token: int) -> int:
+        with Tracer._lock:
+            Tracer._fold_peak()
+            peak = Tracer._open_peaks.pop(token)
+        if not Tracer._span_peaks:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak
+
+    @staticmethod
+    def _fold_peak() -> None:
+        peak = Tracer._read_peak()
+        if peak is None:
+            Tracer._span_peaks = False
+            return
+        for token, open_peak in Tracer._open_peaks.items():
+            Tracer._open_peaks[token] = max(open_peak, peak)
+
+    @staticmethod
+    def _read_peak() -> int | None:
+        try:
+            with open(Tracer.STATUS_PATH) as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1])
+        except (OSError, ValueError):
+            return None
+        return None
+
+    @staticmethod
+    def export(trace_path: str) -> None:
+        with Tracer._lock:
+            events = list(Tracer._events)
+        with open(trace_path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fp=f)
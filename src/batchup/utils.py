@@ -1,17 +1,29 @@
+import json
+import os
 import subprocess
+import tempfile
+
+from batchup.ssh import Ssh
+from batchup.tracing import Tracer
 
 
 class Utils:
 
     @staticmethod
-    def check_ssh_connection(remote_server: str) -> bool:
+    def check_ssh_connection(remote_server: str, timeout: int | None = None) -> bool:
+        cmd = Ssh.command(remote_server, "echo")
+        if timeout is not None:
+            cmd[1:1] = ["-o", "BatchMode=yes"]
         try:
-            subprocess.run(
-                ["ssh", remote_server, "echo"],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
+            with Tracer.span("ssh-probe", host=remote_server):
+                subprocess.run(
+                    cmd,
+                    check=True,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=timeout,
+                )
             return True
         except:
             return False
@@ -27,3 +39,54 @@ class Utils:
     def has_server_connection(external_backup_path: str) -> bool:
         remote_server = Utils.get_server_from_path(external_backup_path)
         return Utils.check_ssh_connection(remote_server)
+
+    @staticmethod
+    def get_cache_path(file_name: str) -> str:
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        return os.path.join(cache_home, "batchup", file_name)
+
+    @staticmethod
+    def get_state_path(file_name: str) -> str:
+        state_home = os.environ.get("XDG_STATE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".local", "state"
+        )
+        return os.path.join(state_home, "batchup", file_name)
+
+    @staticmethod
+    def load_json_state(path: str) -> dict:
+        # A missing or unreadable state file counts as empty state.
+        if not os.path.isfile(path):
+            return {}
+        try:
+            with open(path) as f:
+                state = json.load(fp=f)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    @staticmethod
+    def save_json_state(path: str, state: dict, indent: int | None = None) -> None:
+        # Written beside the target and renamed over it, so an interrupted
+        # write never leaves a torn file that would load as empty state.
+        dir_path = os.path.dirname(path)
+        os.makedirs(dir_path, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            dir=dir_path, prefix=f".{os.path.basename(path)}."
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, fp=f, indent=indent)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    @staticmethod
+    def format_size(size: float) -> str:
+        for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+            if abs(size) < 1024 or unit == "TiB":
+                break
+            size /= 1024
+        return f"{size:.1f} {unit}"
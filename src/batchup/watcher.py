@@ -0,0 +1,157 @@
+import os
+import time
+from typing import Callable
+
+from batchup.config import BackupJob
+from batchup.inotify import Inotify
+from batchup.logger import SimpleLogger
+
+
+class Watcher:
+    WATCH_MASK = (
+        Inotify.IN_MODIFY
+        | Inotify.IN_ATTRIB
+        | Inotify.IN_CLOSE_WRITE
+        | Inotify.IN_MOVED_FROM
+        | Inotify.IN_MOVED_TO
+        | Inotify.IN_CREATE
+        | Inotify.IN_DELETE
+        | Inotify.IN_ONLYDIR
+        | Inotify.IN_DONT_FOLLOW
+        | Inotify.IN_EXCL_UNLINK
+    )
+    REMOVED_MASK = Inotify.IN_DELETE | Inotify.IN_MOVED_FROM
+    MAX_CHANGED_PATHS = 10000
+
+    def __init__(
+        self,
+        logger: SimpleLogger,
+        jobs: list[BackupJob],
+        run_backup: Callable[[BackupJob, list[str]], bool],
+        debounce: float,
+        min_interval: float,
+    ) -> None:
+        self.logger = logger
+        self.jobs = jobs
+        self.run_backup = run_backup
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.matchers = [job.get_exclude_matcher() for job in jobs]
+        # Overlapping include roots share a watch descriptor, so each one may
+        # report to several jobs.
+        self.watches: dict[int, list[tuple[int, str, str]]] = {}
+        self.changed: dict[int, set[str]] = {}
+        self.last_event_time = 0.0
+        self.last_backup_time: dict[int, float] = {}
+
+    def run(self) -> None:
+        self.inotify = Inotify()
+        try:
+            for job_index, job in enumerate(self.jobs):
+                for include_path in job.includes:
+                    self._watch_tree(job_index, include_path, include_path)
+            self.logger.info(f"Watching {len(self.watches)} directories...")
+            while True:
+                for event in self.inotify.read(self._get_timeout()):
+                    self._handle_event(*event)
+                self._run_due_backups()
+        finally:
+            self.inotify.close()
+
+    def _get_timeout(self) -> float | None:
+        if not self.changed:
+            return None
+        due_times = []
+        for job_index in self.changed:
+            due_time = self.last_event_time + self.debounce
+            last_backup = self.last_backup_time.get(job_index)
+            if last_backup is not None:
+                due_time = max(due_time, last_backup + self.min_interval)
+            due_times.append(due_time)
+        return max(min(due_times) - time.monotonic(), 0.1)
+
+    def _watch_tree(self, job_index: int, include_path: str, root_path: str) -> None:
+        matcher = self.matchers[job_index]
+        stack = [root_path]
+        while stack:
+            dir_path = stack.pop()
+            try:
+                wd = self.inotify.add_watch(dir_path, self.WATCH_MASK)
+                entries = list(os.scandir(dir_path))
+            except OSError as e:
+                self.logger.debug(f"Cannot watch '{dir_path}': {e}")
+                continue
+            targets = self.watches.setdefault(wd, [])
+            if (job_index, include_path, dir_path) not in targets:
+                targets.append((job_index, include_path, dir_path))
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False) and not matcher.is_excluded(
+                    include_path, entry.path
+                ):
+                    stack.append(entry.path)
+
+    def _handle_event(self, wd: int, mask: int, name: str) -> None:
+        if mask & Inotify.IN_Q_OVERFLOW:
+            # Events were lost, so back up and rewatch every root in full.
+            self.logger.warning("Inotify queue overflowed, scheduling full backups.")
+            for job_index, job in enumerate(self.jobs):
+                for include_path in job.includes:
+                    self._watch_tree(job_index, include_path, include_path)
+                self.changed[job_index] = set(job.includes)
+            self.last_event_time = time.monotonic()
+            return
+        if mask & Inotify.IN_IGNORED:
+            self.watches.pop(wd, None)
+            return
+        if wd not in self.watches or not name:
+            return
+
+        for job_index, include_path, dir_path in list(self.watches[wd]):
+            path = os.path.join(dir_path, name)
+            if self.matchers[job_index].is_excluded(include_path, path):
+                continue
+            self.last_event_time = time.monotonic()
+            # Deletions are picked up by the next full backup.
+            if mask & self.REMOVED_MASK:
+                continue
+            if mask & Inotify.IN_ISDIR and mask & (
+                Inotify.IN_CREATE | Inotify.IN_MOVED_TO
+            ):
+                self._watch_tree(job_index, include_path, path)
+            changed = self.changed.setdefault(job_index, set())
+            if len(changed) < self.MAX_CHANGED_PATHS:
+                changed.add(path)
+            else:
+                self.changed[job_index] = set(self.jobs[job_index].includes)
+
+    def _run_due_backups(self) -> None:
+        now = time.monotonic()
+        if not self.changed or now - self.last_event_time < self.debounce:
+            return
+        for job_index in list(self.changed):
+            last_backup = self.last_backup_time.get(job_index)
+            if last_backup is not None and now - last_backup < self.min_interval:
+                continue
+            paths = [
+                path
+                for path in self._collapse(self.changed.pop(job_index))
+                if os.path.lexists(path)
+            ]
+            if not paths:
+                continue
+            job = self.jobs[job_index]
+            self.logger.info(f"Backing up {len(paths)} changed path(s) of '{job.name}'")
+            self.last_backup_time[job_index] = time.monotonic()
+            if not self.run_backup(job, paths):
+                self.logger.error(f"Watch backup failed for job: {job.name}")
+                # Retried after the minimum interval instead of being dropped.
+                self.changed.setdefault(job_index, set()).update(paths)
+
+    @staticmethod
+    def _collapse(paths: set[str]) -> list[str]:
+        collapsed: list[str] = []
+        for path in sorted(paths, key=lambda path: path.split("/")):
+            if collapsed and path.startswith(collapsed[-1].rstrip("/") + "/"):
+                continue
+            collapsed.append(path)
+        return collapsed